@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+seir-sim
+
+Simulates many independent replicates of the synchronous (tau-leaping) SEIR
+model on the same contact network at once
+"""
+
+import numpy as np
+
+from tauLeapSim import adjacencyMatrix
+
+class Replicate():
+    '''
+    A view of a single replicate of a BatchSim, which exposes the attributes
+    used by policies (G, nodeStates, sourceNode and rng). nodeStates is a view of
+    the replicate's row of the batch state array, so changes made by a
+    policy are applied to the batch
+    '''
+    def __init__(self,batch,index):
+        self.G = batch.G
+        self.nodeStates = batch.nodeStates[index]
+        self.sourceNode = batch.sourceNodes[index]
+        self.rng = batch.rngs[index]
+
+    def setNodeStates(self,nodes,states):
+        '''
+        Sets the states of an array of nodes of the replicate at once
+        '''
+        self.nodeStates[nodes] = states
+
+class BatchSim():
+    """
+    Creates R independent replicates of the fixed time step SEIR simulation
+    used by TauLeapSim, stored as an R x N array of node states. Each step
+    advances every active replicate at once, so the Python overhead of a
+    step is shared by all of the replicates
+    
+    Each replicate draws from its own random number generator, spawned from
+    rngSeed, so the results of a replicate do not depend on how many other
+    replicates are run alongside it. A replicate stops consuming random
+    numbers once it has no exposed or infectious nodes
+    
+    Parameters:
+        G: The contact network used to run the simulation (networkX graph)
+        expRate: The rate of conversion from Susceptible to Exposed
+        infRate: The rate of conversion from Exposed to Infected
+        recRate: The rate of conversion from Infected to Removed/Recovered
+        numReplicates: The number of replicates R to simulate
+        dt (optional): The length of each time step; 1 by default
+        rngSeed (optional): Seed or SeedSequence from which the replicate
+            generators are spawned
+        tallyFuncs (optional): Functions to be used as tally statistics
+            during the simulation run. Each is applied to each replicate
+    """
+    def __init__(self,G,expRate,infRate,recRate,numReplicates,
+                 dt=1.0,
+                 rngSeed=None,
+                 tallyFuncs=None):
+        self.G = G
+        self.expRate = expRate
+        self.infRate = infRate
+        self.recRate = recRate
+        self.numReplicates = numReplicates
+        self.dt = dt
+        self.tallyFuncs = tallyFuncs
+        self.rngSeed = rngSeed
+        
+        if not isinstance(rngSeed,np.random.SeedSequence):
+            rngSeed = np.random.SeedSequence(rngSeed)
+        seeds = rngSeed.spawn(numReplicates)
+        self.rngs = [np.random.default_rng(seed) for seed in seeds]
+        
+        self.adjacency = adjacencyMatrix(G)
+        numNodes = self.adjacency.shape[0]
+        
+        self.nodeStates = np.zeros((numReplicates,numNodes),dtype=np.int8)
+        
+        #Mark a single node of each replicate as infectious
+        self.sourceNodes = np.array([rng.integers(numNodes) for rng in self.rngs])
+        self.nodeStates[np.arange(numReplicates),self.sourceNodes] = 2
+        
+        self.replicates = [Replicate(self,r) for r in range(numReplicates)]
+        
+        #Replicates which still have exposed or infectious nodes
+        self.active = np.ones(numReplicates,dtype=bool)
+        
+        self.t = 0
+        
+        self.useTally = not tallyFuncs is None
+        
+        if (self.useTally):
+            self.tallyStats = []
+            self.tallyTimes = []
+            self.recordTallyStats()
+    
+    def __copy__(self):
+        return self.withGraph(self.G)
+    
+    def withGraph(self,G):
+        '''
+        Returns a new batch on the contact network G with the same
+        parameters as this one
+        '''
+        return type(self)(G,self.expRate,self.infRate,self.recRate,
+                 self.numReplicates,
+                 dt=self.dt,
+                 rngSeed=self.rngSeed,
+                 tallyFuncs=self.tallyFuncs)
+    
+    def __getstate__(self):
+        #The adjacency matrix is rebuilt from G rather than pickled
+        state = self.__dict__.copy()
+        del state['adjacency']
+        return state
+    
+    def __setstate__(self,state):
+        self.__dict__.update(state)
+        self.adjacency = adjacencyMatrix(self.G)
+    
+    def step(self):
+        '''
+        Advances every node of every active replicate by one time step
+        '''
+        active = np.flatnonzero(self.active)
+        states = self.nodeStates[active]
+        susceptible = states==0
+        exposed = states==1
+        infectious = states==2
+        
+        #Number of infectious neighbors of each node, per replicate
+        pressure = self.adjacency.dot(infectious.T.astype(np.float32)).T
+        
+        probSE = -np.expm1(-self.expRate*self.dt*pressure)
+        probEI = -np.expm1(-self.infRate*self.dt)
+        probIR = -np.expm1(-self.recRate*self.dt)
+        
+        x = np.empty(states.shape)
+        for row,r in enumerate(active):
+            self.rngs[r].random(out=x[row])
+        
+        states[susceptible & (x < probSE)] = 1
+        states[exposed & (x < probEI)] = 2
+        states[infectious & (x < probIR)] = 3
+        
+        self.nodeStates[active] = states
+        self.t = self.t + self.dt
+        
+    def simulate(self,policies=None):
+        '''
+        Runs the SEIR simulation for every replicate until each has no
+        exposed or infectious nodes
+        
+        Returns:
+        tallyResults: An array of shape (T,R,F) containing the result of
+            each of the F tally functions for each replicate at each of the
+            T recorded time steps. Finished replicates repeat their final
+            tally values
+        '''
+        self.policies = policies
+            
+        #Execute any policies with runOnInit=True on each replicate
+        if not self.policies is None:
+            for policy in self.policies:
+                if not policy is None and policy.runOnInit:
+                    for replicate in self.replicates:
+                        policy.execute(replicate)
+        
+        self.updateActive()
+        
+        #Simulation time step loop
+        while np.any(self.active):
+            
+            self.step()
+            self.updateActive()
+            
+            if self.useTally:
+                self.recordTallyStats()
+            
+            if not self.policies is None:
+                for policy in self.policies:
+                    if not policy is None and policy.runEachTimestep:
+                        for r in np.flatnonzero(self.active):
+                            policy.execute(self.replicates[r])
+        
+        return np.array(self.tallyStats) if self.useTally else None
+    
+    def updateActive(self):
+        '''
+        Marks replicates with no exposed or infectious nodes as finished
+        '''
+        self.active = np.any((self.nodeStates==1) | (self.nodeStates==2),axis=1)
+
+    def recordTallyStats(self):
+        '''
+        Helper method thats calls all tally functions passed to the simulation
+        on each replicate
+        '''
+        tResults = []
+        for states in self.nodeStates:
+            simState = [states]
+            tResults.append([f(simState) for f in self.tallyFuncs])
+        self.tallyStats.append(tResults)
+        self.tallyTimes.append(self.t)
+        return self.tallyStats
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for the seir-sim engine, ranking algorithms and policies
+
+Times SeirSim.simulate, DIL, twoStepHeuristic, acquaintanceN,
+generateRandomGraph and each vaccination policy on random graphs of several
+sizes and densities, recording the best time of several repeats, events per
+second for simulations and the peak memory allocated (measured in a separate,
+untimed run with tracemalloc). Results are written as JSON, and can be
+compared against a saved baseline, failing if any case has slowed down or
+used more memory by more than a threshold
+
+The default sizes run on an ordinary machine. Graphs of a million nodes need
+several GB of memory and are run by passing --sizes
+
+Usage:
+    python benchmark.py --output results.json
+    python benchmark.py --sizes 1000 10000 --baseline baseline.json
+    python benchmark.py --sizes 1000000 --densities 1 --output large.json
+    python benchmark.py --save-baseline baseline.json
+"""
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+from math import log1p
+
+import numpy as np
+
+import networkalgs
+import rankings
+from seirSim import SeirSim
+from policies import (vaccinateTopNDIL,vaccinateTopNDegree,vaccinateNRandom,
+                      vaccinateTopNTSH,vaccinateNAcquaintance,ringVaccination)
+
+#Use parameters estimated from Ebola epidemics in Sierra Leone
+#Source: https://www.ncbi.nlm.nih.gov/pmc/articles/PMC4169395/
+exposureRate = .45 #Beta
+infectionRate = 1/5.3 #Sigma
+recoveryRate = 1/5.61 #Gamma
+
+def benchmarkGraph(numNodes,prob,seed):
+    '''
+    Returns a connected G(n,p) random graph as a CSRGraph, generated with
+    fastRandomCSR so that graphs of a million nodes can be built quickly
+    '''
+    indptr,indices = networkalgs.fastRandomCSR(numNodes,prob,
+                                               rng=np.random.default_rng(seed))
+    return networkalgs.CSRGraph(indptr,indices)
+
+#Each benchmark case is a function case(G,numNodes,prob,seed) which does any
+#setup and returns a function run() to be timed. run returns the number of
+#simulation events it produced, or None
+def simulateCase(G,numNodes,prob,seed):
+    def run():
+        sim = SeirSim(G,exposureRate,infectionRate,recoveryRate,rngSeed=seed)
+        sim.simulate()
+        return sim.numEvents
+    return run
+
+def dilCase(G,numNodes,prob,seed):
+    def run():
+        networkalgs.DIL(G)
+    return run
+
+def tshCase(G,numNodes,prob,seed):
+    n = max(numNodes//100,1)
+    def run():
+        networkalgs.twoStepHeuristic(G,2*n,n,rng=np.random.default_rng(seed))
+    return run
+
+def acquaintanceCase(G,numNodes,prob,seed):
+    n = max(numNodes//100,1)
+    def run():
+        networkalgs.acquaintanceN(G,n,rng=np.random.default_rng(seed))
+    return run
+
+def generateRandomGraphCase(G,numNodes,prob,seed):
+    def run():
+        networkalgs.generateRandomGraph(numNodes,prob,
+                                        rng=np.random.default_rng(seed))
+    return run
+
+def policyCase(policyClass):
+    '''
+    Returns a case timing the execution of a vaccination policy, vaccinating
+    1% of the nodes, on a new simulation. Cached rankings are discarded
+    before each run
+    '''
+    def case(G,numNodes,prob,seed):
+        policy = policyClass(max(numNodes//100,1))
+        def run():
+            rankings._indices.clear()
+            sim = SeirSim(G,exposureRate,infectionRate,recoveryRate,rngSeed=seed)
+            policy.execute(sim)
+        return run
+    return case
+
+def ringVaccinationCase(G,numNodes,prob,seed):
+    def run():
+        sim = SeirSim(G,exposureRate,infectionRate,recoveryRate,rngSeed=seed)
+        sim.simulate([ringVaccination(capacity=max(numNodes//1000,1))])
+        return sim.numEvents
+    return run
+
+#Benchmark cases by name
+cases = {'simulate':simulateCase,
+         'DIL':dilCase,
+         'twoStepHeuristic':tshCase,
+         'acquaintanceN':acquaintanceCase,
+         'generateRandomGraph':generateRandomGraphCase,
+         'vaccinateTopNDIL':policyCase(vaccinateTopNDIL),
+         'vaccinateTopNDegree':policyCase(vaccinateTopNDegree),
+         'vaccinateNRandom':policyCase(vaccinateNRandom),
+         'vaccinateTopNTSH':policyCase(vaccinateTopNTSH),
+         'vaccinateNAcquaintance':policyCase(vaccinateNAcquaintance),
+         'ringVaccination':ringVaccinationCase}
+
+def timeCase(run,repeats):
+    '''
+    Returns the best time of repeats runs, the number of events of the
+    last run and the peak memory allocated by one further run
+    '''
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        events = run()
+        best = min(best,time.perf_counter()-start)
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best,events,peak
+
+def runBenchmarks(sizes,densities,caseNames=None,repeats=3,seed=2018,
+                  maxNetworkxNodes=100000,log=print):
+    '''
+    Runs the benchmark cases on a random graph for every size and density
+
+    Parameters:
+        sizes: The numbers of nodes of the graphs
+        densities: Multiples of the connectivity threshold ln(n)/n used as
+            the edge probability of the graphs
+        caseNames (optional): The names of the cases to run; all by default
+        repeats (optional): The number of timed runs of each case
+        seed (optional): The seed of the graphs and of each case
+        maxNetworkxNodes (optional): The largest graph generated by the
+            generateRandomGraph case, which builds a networkx graph
+        log (optional): A function called with a line of progress output
+
+    Returns:
+        results: A dict of results by key 'case/n=numNodes/density=density'
+    '''
+    if caseNames is None:
+        caseNames = list(cases)
+    results = {}
+    for numNodes in sizes:
+        for density in densities:
+            prob = min(density*log1p(numNodes)/numNodes,1.)
+            G = benchmarkGraph(numNodes,prob,seed)
+            for name in caseNames:
+                if name == 'generateRandomGraph' and numNodes > maxNetworkxNodes:
+                    continue
+                run = cases[name](G,numNodes,prob,seed)
+                seconds,events,peak = timeCase(run,repeats)
+                key = '%s/n=%d/density=%g' % (name,numNodes,density)
+                results[key] = {'case':name,
+                                'numNodes':numNodes,
+                                'numEdges':G.number_of_edges(),
+                                'density':density,
+                                'seconds':seconds,
+                                'events':events,
+                                'eventsPerSecond':None if events is None
+                                    else events/seconds,
+                                'peakMemory':peak}
+                log('%-50s %10.4fs %12s %10.1f MB' % (
+                    key,seconds,
+                    '' if events is None else '%.0f ev/s' % (events/seconds),
+                    peak/2**20))
+    return results
+
+def compareResults(results,baseline,threshold=.2,minSeconds=.001,
+                   memoryThreshold=.2,minMemory=2**20):
+    '''
+    Compares benchmark results with a baseline
+
+    Parameters:
+        results: Results as returned by runBenchmarks
+        baseline: Results of an earlier run
+        threshold (optional): The largest allowed relative increase in time
+        minSeconds (optional): Cases taking less time than this are too
+            noisy to compare and are never reported
+        memoryThreshold (optional): The largest allowed relative increase in
+            peak memory
+        minMemory (optional): Cases whose peak memory is less than this many
+            bytes are never reported for memory
+
+    Returns:
+        regressions: A list of (key,measure,baselineValue,value) for each
+            case in both results and baseline whose 'seconds' or
+            'peakMemory' grew by more than its threshold
+    '''
+    limits = (('seconds',threshold,minSeconds),
+              ('peakMemory',memoryThreshold,minMemory))
+    regressions = []
+    for key,result in results.items():
+        if key in baseline:
+            for measure,limit,smallest in limits:
+                before = baseline[key][measure]
+                if result[measure] > max(before*(1+limit),smallest):
+                    regressions.append((key,measure,before,result[measure]))
+    return regressions
+
+def saveResults(results,path):
+    '''
+    Writes benchmark results to a JSON file, with the versions they were
+    measured with
+    '''
+    document = {'python':platform.python_version(),
+                'numpy':np.__version__,
+                'platform':platform.platform(),
+                'date':time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'results':results}
+    with open(path,'w') as f:
+        json.dump(document,f,indent=2)
+
+def loadResults(path):
+    '''
+    Reads benchmark results written by saveResults
+    '''
+    with open(path) as f:
+        return json.load(f)['results']
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes',type=int,nargs='+',
+                        default=[1000,10000,100000])
+    parser.add_argument('--densities',type=float,nargs='+',default=[1.,4.])
+    parser.add_argument('--cases',nargs='+',choices=list(cases))
+    parser.add_argument('--repeats',type=int,default=3)
+    parser.add_argument('--seed',type=int,default=2018)
+    parser.add_argument('--max-networkx-nodes',type=int,default=100000)
+    parser.add_argument('--output',help='write the results to this JSON file')
+    parser.add_argument('--baseline',help='compare against this JSON file')
+    parser.add_argument('--save-baseline',
+                        help='write the results to this JSON file as a baseline')
+    parser.add_argument('--threshold',type=float,default=.2,
+                        help='allowed relative slowdown against the baseline')
+    parser.add_argument('--memory-threshold',type=float,default=.2,
+                        help='allowed relative increase in peak memory '
+                             'against the baseline')
+    args = parser.parse_args(argv)
+
+    results = runBenchmarks(args.sizes,args.densities,args.cases,
+                            repeats=args.repeats,seed=args.seed,
+                            maxNetworkxNodes=args.max_networkx_nodes)
+    for path in (args.output,args.save_baseline):
+        if not path is None:
+            saveResults(results,path)
+
+    if not args.baseline is None:
+        regressions = compareResults(results,loadResults(args.baseline),
+                                     args.threshold,
+                                     memoryThreshold=args.memory_threshold)
+        for key,measure,before,after in regressions:
+            if measure == 'seconds':
+                change = '%.4fs -> %.4fs' % (before,after)
+            else:
+                change = '%.1f MB -> %.1f MB' % (before/2**20,after/2**20)
+            print('REGRESSION %s %s: %s (%+.0f%%)' % (
+                key,measure,change,100*(after/before-1)))
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
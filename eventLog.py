@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Compact event log used by seir-sim
+
+Rather than storing a copy of the node state array after every event, the
+log stores each state transition as (time, node, from-state, to-state) in
+a structured NumPy array, plus a copy of the node states every keyframeInterval
+events. The state after any event is reconstructed on demand by replaying
+the transitions since the nearest preceding keyframe.
+"""
+import numpy as np
+
+from networkalgs import nodeIdDtype
+
+class EventLog():
+    '''
+    A log of the state transitions of a simulation
+    
+    Indexing the log with i returns [nodeStates] after the i-th event, where
+    index 0 is the initial state, so len(log) and log[-1][0] behave like the
+    list of state snapshots previously kept by SeirSim
+    
+    Parameters:
+        initialStates: The node state array at the start of the simulation
+        t0 (optional): The simulation time of the initial state
+        keyframeInterval (optional): The number of events between stored
+            copies of the node state array
+    '''
+    __slots__ = ('keyframeInterval','t0','_events','_numEvents',
+                 '_keyframes','_current')
+    
+    def __init__(self,initialStates,t0=0,keyframeInterval=1000):
+        self.keyframeInterval = keyframeInterval
+        
+        self._events = np.zeros(1024,dtype=[
+            ('t',np.float64),
+            ('node',nodeIdDtype(len(initialStates))),
+            ('fromState',np.int8),
+            ('toState',np.int8)])
+        self._numEvents = 0
+        
+        self.reset(initialStates,t0)
+    
+    def reset(self,initialStates,t0=0):
+        '''
+        Discards all events and sets the initial state of the log
+        '''
+        self._numEvents = 0
+        self.t0 = t0
+        #keyframes[k] is the state after event k*keyframeInterval
+        self._keyframes = [np.array(initialStates,dtype=np.int8)]
+        self._current = self._keyframes[0].copy()
+    
+    def __len__(self):
+        return self._numEvents + 1
+    
+    def __getitem__(self,index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('event index out of range')
+        return [self.stateAt(index)]
+    
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+    
+    @property
+    def events(self):
+        '''
+        The recorded transitions as a structured array with fields t, node,
+        fromState and toState
+        '''
+        return self._events[:self._numEvents]
+    
+    @property
+    def times(self):
+        return self.events['t']
+    
+    @property
+    def nodes(self):
+        return self.events['node']
+    
+    @property
+    def fromStates(self):
+        return self.events['fromState']
+    
+    @property
+    def toStates(self):
+        return self.events['toState']
+    
+    @property
+    def nbytes(self):
+        '''
+        The number of bytes used by the log's arrays
+        '''
+        return self._events.nbytes + self._current.nbytes*(len(self._keyframes)+1)
+    
+    def _grow(self):
+        events = np.zeros(2*len(self._events),dtype=self._events.dtype)
+        events[:self._numEvents] = self._events
+        self._events = events
+    
+    def record(self,t,node,fromState,toState):
+        '''
+        Appends the transition of node from fromState to toState at time t
+        '''
+        if self._numEvents == len(self._events):
+            self._grow()
+        self._events[self._numEvents] = (t,node,fromState,toState)
+        self._numEvents += 1
+        
+        self._current[node] = toState
+        if self._numEvents % self.keyframeInterval == 0:
+            self._keyframes.append(self._current.copy())
+    
+    def stateAt(self,index):
+        '''
+        Returns the node state array after the first index events
+        '''
+        k = index // self.keyframeInterval
+        if k == len(self._keyframes)-1 and index == self._numEvents:
+            return self._current.copy()
+        states = self._keyframes[k].copy()
+        start = k*self.keyframeInterval
+        events = self._events[start:index]
+        states[events['node']] = events['toState']
+        return states
+    
+    def stateAtTime(self,t):
+        '''
+        Returns the node state array after every event at or before time t
+        '''
+        index = np.searchsorted(self.times,t,side='right')
+        return self.stateAt(index)
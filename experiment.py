@@ -5,6 +5,26 @@ Created on Mon Jun  4 19:09:01 2018
 @author: pnter
 """
 import copy
+import shutil
+import tempfile
+from multiprocessing import Pool
+
+import networkalgs
+
+#The simulation copied by each task of a parallel Experiment.compare
+_workerSimulation = None
+
+def _initWorker(simulation):
+    global _workerSimulation
+    _workerSimulation = simulation
+
+def _runPolicies(policies):
+    '''
+    Runs a copy of the worker's simulation with the given policies
+    '''
+    sim = copy.copy(_workerSimulation)
+    logs,stats = sim.simulate(policies)
+    return logs,stats,getattr(sim,'tallyTimes',None)
 
 class Experiment():
     '''
@@ -16,17 +36,48 @@ class Experiment():
         self.simulation = simulation
         self.stats = []
         self.logs = []
-        
-    def compare(self,policySets):
+        self.times = []
+
+    def compare(self,policySets,processes=None):
         '''
         Arguments:
             policySets: an array where each entry is an list of policies to use
                 for a single simulation
+            processes (optional): If given, the policy sets are run in
+                parallel on a pool of this many processes. The contact network
+                is written once to CSR arrays which each process memory-maps
+                as a CSRGraph, rather than being pickled for every task. Policies and
+                tally functions must be picklable. Results are returned in the
+                order of policySets, and match a serial run if the simulation
+                was given an rngSeed
         '''
-        for policies in policySets:
-            sim = copy.copy(self.simulation)
-            logs,stats = sim.simulate(policies)
+        if processes is None:
+            results = []
+            for policies in policySets:
+                sim = copy.copy(self.simulation)
+                logs,stats = sim.simulate(policies)
+                results.append((logs,stats,getattr(sim,'tallyTimes',None)))
+        else:
+            results = self._compareParallel(policySets,processes)
+
+        for logs,stats,times in results:
             self.logs.append(logs)
             self.stats.append(stats)
-        
-        return self.logs,self.stats
\ No newline at end of file
+            self.times.append(times)
+
+        return self.logs,self.stats
+
+    def _compareParallel(self,policySets,processes):
+        directory = tempfile.mkdtemp(prefix='seir-sim-')
+        try:
+            networkalgs.saveCSR(self.simulation.G,directory)
+            template = self.simulation.withGraph(
+                networkalgs.loadCSRGraph(directory))
+            with Pool(processes,initializer=_initWorker,
+                      initargs=(template,)) as pool:
+                results = pool.map(_runPolicies,policySets)
+        finally:
+            networkalgs._csrGraphs.pop(directory,None)
+            shutil.rmtree(directory,ignore_errors=True)
+
+        return results
@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+"""
+Indexed set containers used by seir-sim
+
+Both containers hold their contents in typed NumPy arrays, which double their
+capacity when full, with a dict mapping each member to its position in the
+arrays. Membership tests, insertion, removal (by swapping with the last
+element) and uniform sampling by position are all O(1), and the memory used
+grows with the size of the set rather than the size of the graph. They
+support len(), iteration, `in` and integer indexing
+"""
+import sys
+
+import numpy as np
+
+def _reserve(array,size):
+    '''
+    Returns array, or a copy of it with at least twice the capacity if it has
+    fewer than size elements
+    '''
+    if size <= len(array):
+        return array
+    grown = np.zeros(max(2*len(array),size),dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+class IndexedSet():
+    '''
+    A set of nodes with O(1) insertion, removal and indexing
+
+    Parameters:
+        items (optional): Initial contents of the set
+        dtype (optional): The integer type the nodes are stored as
+    '''
+    __slots__ = ('_items','_pos')
+
+    def __init__(self,items=(),dtype=np.int32):
+        items = np.asarray(items,dtype=dtype).ravel()
+        #Keep the first occurrence of each item
+        _,first = np.unique(items,return_index=True)
+        items = items[np.sort(first)]
+        self._items = _reserve(np.zeros(16,dtype=dtype),len(items))
+        self._items[:len(items)] = items
+        self._pos = dict(zip(items.tolist(),range(len(items))))
+
+    def __len__(self):
+        return len(self._pos)
+
+    def __iter__(self):
+        return iter(self.array().tolist())
+
+    def __contains__(self,item):
+        return item in self._pos
+
+    def __getitem__(self,index):
+        return self.array()[index].item()
+
+    def __copy__(self):
+        return IndexedSet(self.array(),self._items.dtype)
+
+    def copy(self):
+        return self.__copy__()
+
+    def __getstate__(self):
+        return self.array().copy()
+
+    def __setstate__(self,items):
+        IndexedSet.__init__(self,items,items.dtype)
+
+    @property
+    def nbytes(self):
+        '''
+        The approximate number of bytes used by the set's containers
+        '''
+        return self._items.nbytes + sys.getsizeof(self._pos)
+
+    def array(self):
+        '''
+        Returns a view of the items in the set, in order
+        '''
+        return self._items[:len(self._pos)]
+
+    def add(self,item):
+        '''
+        Add item to the set. Does nothing if item is already present
+        '''
+        if item not in self._pos:
+            size = len(self._pos)
+            self._items = _reserve(self._items,size+1)
+            self._items[size] = item
+            self._pos[item] = size
+
+    def remove(self,item):
+        '''
+        Remove item from the set by swapping it with the last element
+
+        Raises KeyError if item is not present
+        '''
+        index = self._pos.pop(item)
+        last = len(self._pos)
+        if index < last:
+            lastItem = self._items[last].item()
+            self._items[index] = lastItem
+            self._pos[lastItem] = index
+
+    def discard(self,item):
+        '''
+        Remove item from the set if it is present
+        '''
+        if item in self._pos:
+            self.remove(item)
+
+class GraphEdgeSet():
+    '''
+    A set of edges (i,j) of a graph, stored as the typed NumPy arrays first
+    and second of the endpoints i and j and ids of the graph's edge ids,
+    with a dict mapping each edge id to its position in the arrays
+
+    Membership and removal are orientation-insensitive, and removing the
+    edges of a node costs O(degree)
+
+    Parameters:
+        graph: The CompiledGraph (see networkalgs.compileGraph) whose edges
+            the set holds
+        edges (optional): Initial contents of the set
+    '''
+    __slots__ = ('graph','_first','_second','_ids','_pos')
+
+    def __init__(self,graph,edges=()):
+        self.graph = graph
+        self._first = np.zeros(16,dtype=graph.indices.dtype)
+        self._second = np.zeros(16,dtype=graph.indices.dtype)
+        self._ids = np.zeros(16,dtype=graph.edgeIds.dtype)
+        self._pos = {}
+        edges = np.asarray(list(edges),dtype=np.int64).reshape(-1,2)
+        if len(edges):
+            ids = self.edgeIdsOf(edges[:,0],edges[:,1])
+            #Keep the first occurrence of each edge
+            _,first = np.unique(ids,return_index=True)
+            first = np.sort(first)
+            self.addEdges(ids[first],edges[first,0],edges[first,1])
+
+    def __len__(self):
+        return len(self._pos)
+
+    def __iter__(self):
+        first,second = self.pairs()
+        return zip(first.tolist(),second.tolist())
+
+    def __contains__(self,edge):
+        return self._edgeId(*edge) in self._pos
+
+    def __getitem__(self,index):
+        size = len(self._pos)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError('edge index out of range')
+        return (self._first[index].item(),self._second[index].item())
+
+    def __copy__(self):
+        first,second = self.pairs()
+        edges = GraphEdgeSet(self.graph)
+        edges.addEdges(self._ids[:len(self._pos)],first,second)
+        return edges
+
+    def copy(self):
+        return self.__copy__()
+
+    def __getstate__(self):
+        #The graph is not pickled; the owner reattaches it with attachGraph
+        first,second = self.pairs()
+        return (self._ids[:len(self._pos)].copy(),first.copy(),second.copy())
+
+    def __setstate__(self,state):
+        ids,first,second = state
+        self.graph = None
+        self._first = np.zeros(16,dtype=first.dtype)
+        self._second = np.zeros(16,dtype=second.dtype)
+        self._ids = np.zeros(16,dtype=ids.dtype)
+        self._pos = {}
+        self.addEdges(ids,first,second)
+
+    def attachGraph(self,graph):
+        '''
+        Sets the graph of an unpickled set, which must have the same edges as
+        the graph it was pickled with
+        '''
+        self.graph = graph
+
+    @property
+    def nbytes(self):
+        '''
+        The approximate number of bytes used by the set's containers
+        '''
+        return (self._first.nbytes + self._second.nbytes + self._ids.nbytes +
+                sys.getsizeof(self._pos))
+
+    def pairs(self):
+        '''
+        Returns arrays (i,j) of the edges in the set, in order
+        '''
+        size = len(self._pos)
+        return self._first[:size],self._second[:size]
+
+    def _edgeId(self,i,j):
+        '''
+        Returns the edge id of (i,j), or -1 if it is not an edge of the graph
+        '''
+        slot = self.graph.slotsOf([i],[j])[0]
+        return -1 if slot < 0 else self.graph.edgeIds[slot].item()
+
+    def edgeIdsOf(self,first,second):
+        '''
+        Returns the edge ids of the edges (first[k],second[k]) of the graph
+        '''
+        slots = self.graph.slotsOf(first,second)
+        if np.any(slots < 0):
+            raise ValueError('not an edge of the graph')
+        return self.graph.edgeIds[slots]
+
+    def addEdges(self,ids,first,second):
+        '''
+        Adds the edges (first[k],second[k]) with edge ids ids[k], which must
+        be distinct and not already in the set. first or second may be a
+        single node
+        '''
+        ids = np.asarray(ids)
+        start = len(self._pos)
+        end = start+len(ids)
+        self._ids = _reserve(self._ids,end)
+        self._first = _reserve(self._first,end)
+        self._second = _reserve(self._second,end)
+        self._ids[start:end] = ids
+        self._first[start:end] = first
+        self._second[start:end] = second
+        self._pos.update(zip(ids.tolist(),range(start,end)))
+
+    def add(self,edge):
+        '''
+        Add edge to the set. Does nothing if the edge is already present
+        '''
+        i,j = edge
+        edgeId = self._edgeId(i,j)
+        if edgeId < 0:
+            raise ValueError('not an edge of the graph')
+        if not edgeId in self._pos:
+            self.addEdges([edgeId],i,j)
+
+    def _removeIds(self,edgeIds):
+        '''
+        Removes the edges with the given ids, in order, each by swapping it
+        with the last element
+        '''
+        ids,first,second,pos = self._ids,self._first,self._second,self._pos
+        for edgeId in edgeIds:
+            index = pos.pop(edgeId)
+            last = len(pos)
+            if index < last:
+                lastId = ids[last].item()
+                ids[index] = lastId
+                first[index] = first[last]
+                second[index] = second[last]
+                pos[lastId] = index
+
+    def remove(self,edge):
+        '''
+        Remove edge from the set by swapping it with the last element
+
+        Raises KeyError if the edge is not present
+        '''
+        self._removeIds((self._edgeId(*edge),))
+
+    def discard(self,edge):
+        '''
+        Remove edge from the set if it is present
+        '''
+        if edge in self:
+            self.remove(edge)
+
+    def _incidentIds(self,node):
+        '''
+        Returns the ids of the edges in the set incident to node, in order
+        of position
+        '''
+        graph = self.graph
+        pos = self._pos
+        ids = graph.edgeIds[graph.indptr[node]:graph.indptr[node+1]].tolist()
+        return sorted([edgeId for edgeId in ids if edgeId in pos],key=pos.get)
+
+    def edgesOf(self,node):
+        '''
+        Returns the edges in the set which are incident to node
+        '''
+        positions = [self._pos[edgeId] for edgeId in self._incidentIds(node)]
+        return list(zip(self._first[positions].tolist(),
+                        self._second[positions].tolist()))
+
+    def discardNode(self,node):
+        '''
+        Remove every edge incident to node, in order of position
+        '''
+        self._removeIds(self._incidentIds(node))
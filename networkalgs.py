@@ -4,93 +4,83 @@ Created on Thu May 24 21:46:25 2018
 
 @author: pnter
 """
+import os
+import shutil
+import hashlib
+import tempfile
+import weakref
+from itertools import islice
 import numpy as np
 import networkx as nx
-from random import random,choice
+from random import random
 from math import log1p
 from scipy.stats import norm
+from scipy.sparse import csr_matrix,coo_matrix
+from scipy.sparse.csgraph import connected_components
 
-def DIL(G):
-    '''
-    Computes DIL importance statistic for all nodes in graph G
+def DIL(G,blockSize=2**21):
     '''
+    Computes DIL importance statistic for all nodes in graph G, as defined in
+    "Evaluating the importance of nodes in complex networks", Liu et al., 2016
     
-    def countThreeCycles(edge):
-        '''
-        Counts the number of 3-cycles containing edge e_ij
-        
-        cycles is a map from node to the set of cycles containing node
-        '''
-        #Check previously found cycles for e_ij 
-        start = edge[1]
-        end = edge[0]
-        
-        count = 0
-        
-        for cycle in cycles[start]:
-            if end in cycle:
-                count += 1
-        
-        startEdges = G.edges(start)
-        endEdges = G.edges(end)
-        maxCycles = min(len(startEdges),len(endEdges))
-        
-        #e_ij can have no more cycles than degree(j)
-        if count == maxCycles:
-            return count
-        
-        for edge1 in startEdges:
-            middle = edge1[1]
-            for edge2 in G.edges(middle):
-                if edge2[1] == end and {start,middle,end} not in cycles[start]:
-                    count += 1
-                    for node in start,middle,end:
-                        if not {start,middle,end} in cycles[node]: cycles[node].append({start,middle,end})
-                    break
-            if count == maxCycles:
-                break
-            
-        return count
+    The number of triangles containing each edge is counted from sparse
+    products A[rows]*A over blocks of rows of the graph's compiled adjacency
+    arrays, masked by A[rows], so edge importances are stored in arrays of
+    length |E|, indexed by the graph's edge ids, rather than an N x N array.
+    The full two-path matrix A*A is never built, so the memory used is
+    bounded by the block size rather than the sum of the squared degrees
     
-    def I(edge):
-        '''
-        Computes the importance of an edge e_ij
-        '''
-        p = countThreeCycles(edge)
-        u = (G.degree(edge[0])-p-1)*(G.degree(edge[1])-p-1)
-        return u/(p/2+1)
+    Each edge (i,j) is counted once with i<j, and contributes W(i,j) to the
+    DIL of its lower-numbered endpoint i only
     
-    def W(i,j):
-        '''
-        Computes contribution of v_j to importance of v_i
-        
-        Assumes I_ij has already been computed
-        '''
-        degi = G.degree(i)
-        degj = G.degree(j)
-        if degi - degj == 0:
-            return 0
-        else:
-            return edgeToIWArray[i,j,0]*(degi-1)/((degi+degj)-2)
+    Parameters:
+        G: The graph
+        blockSize (optional): The largest number of two-paths counted at
+            once. A single node with more is counted on its own
+    '''
+    graph = compileGraph(G)
+    numNodes = graph.numNodes
+    deg = graph.degrees
+    A = csr_matrix((np.ones(len(graph.indices),dtype=np.int32),graph.indices,
+                    graph.indptr),shape=(numNodes,numNodes))
     
-    def L(i):
-        return G.degree(i)+sum(edgeToIWArray[edge[0],edge[1],1] for edge in G.edges(i))
+    #Number of 3-cycles containing each edge, by edge id
+    p = np.zeros(len(graph.indices)//2)
+    #Split the rows into blocks of at most blockSize two-paths, the number
+    #of two-paths from row i being the sum of the degrees of its neighbors
+    paths = np.concatenate([[0],np.cumsum(A.dot(deg.astype(np.int64)))])
+    start = 0
+    while start < numNodes:
+        end = int(np.searchsorted(paths,paths[start]+blockSize,'right')) - 1
+        end = max(end,start+1)
+        block = A[start:end]
+        #Plus one so that the result has exactly the sparsity pattern of the
+        #block. Its sorted entries line up with the (sorted) compiled
+        #neighbor lists
+        cycles = csr_matrix(block.multiply(block.dot(A)) + block)
+        cycles.sort_indices()
+        slots = slice(graph.indptr[start],graph.indptr[end])
+        p[graph.edgeIds[slots]] = cycles.data - 1
+        start = end
     
-    cycles = [[] for i in G.nodes()]
-    edgeToIWArray = np.zeros((len(G.nodes()),len(G.nodes()),2))
-
-    for edge in G.edges():
-        i,j = edge
-        edgeToIWArray[i,j,0] = I(edge)
-        edgeToIWArray[i,j,1] = W(i,j)
+    i = graph.edges[:,0]
+    j = graph.edges[:,1]
+    degi = deg[i]
+    degj = deg[j]
+    
+    #Importance of each edge e_ij
+    I = (degi-p-1)*(degj-p-1)/(p/2+1)
     
-    nodeToL = np.zeros(len(G.nodes()))
-    for node in G.nodes():
-        nodeToL[node] = L(node)
+    #Contribution of v_j to importance of v_i
+    W = np.zeros(len(I))
+    unequal = degi != degj
+    W[unequal] = I[unequal]*(degi[unequal]-1)/(degi[unequal]+degj[unequal]-2)
+    
+    nodeToL = deg + np.bincount(i,weights=W,minlength=numNodes)
     
     return nodeToL
 
-def generateRandomGraph(numNodes, prob=None):
+def generateRandomGraph(numNodes, prob=None, rng=None):
     '''
     Generates a random graph G with given number of Nodes and either the given
     probability probability p in the Erdos-Renyi G(n,p) model, or nodes with 
@@ -103,6 +93,8 @@ def generateRandomGraph(numNodes, prob=None):
             G(n,p) model. If prob is not provided, p=ln(n)/n will be used,
             as this is the threshold value for which G will almost surely be
             connected
+        rng (optional): A numpy random Generator used to seed the graph
+            generator
     
     Returns:
         G: A networkx graph
@@ -112,12 +104,580 @@ def generateRandomGraph(numNodes, prob=None):
     if (prob is None):
         prob = log1p(numNodes)/numNodes
         
-    G = nx.fast_gnp_random_graph(numNodes,prob)
+    if rng is None:
+        rng = np.random.default_rng()
+        
+    G = nx.fast_gnp_random_graph(numNodes,prob,seed=int(rng.integers(2**31)))
     while not nx.is_connected(G):
-        G = nx.fast_gnp_random_graph(numNodes,prob)
+        G = nx.fast_gnp_random_graph(numNodes,prob,seed=int(rng.integers(2**31)))
+        
+    return G
+
+def toCSR(G):
+    '''
+    Converts the graph G into compressed sparse row (CSR) adjacency arrays
+    
+    Nodes are assumed to be labelled 0,...,n-1, as produced by
+    generateRandomGraph. The arrays of a CSRGraph are returned as they are
+    
+    Returns:
+        indptr: Array of length n+1 such that the neighbors of node i are
+            indices[indptr[i]:indptr[i+1]]
+        indices: Array of length 2|E| containing the neighbors of each node
+    '''
+    if isinstance(G,CSRGraph):
+        return G.indptr,G.indices
+    numNodes = len(G.nodes())
+    edges = np.array(list(G.edges()),dtype=np.int64).reshape(-1,2)
+    return edgesToCSR(edges,numNodes)
+
+def nodeIdDtype(numNodes):
+    '''
+    Returns the smallest integer dtype, int32 or int64, which can hold the
+    ids of numNodes nodes
+    '''
+    return np.int32 if numNodes < 2**31 else np.int64
+
+class CompiledGraph():
+    '''
+    Immutable array form of a graph with nodes 0,...,n-1, shared by every
+    simulation, policy and replicate on the graph; see compileGraph
+    
+    The neighbors of each node are sorted, and are sorted here (into a new
+    indices array) if the given arrays are not
+    
+    Attributes:
+        numNodes: The number of nodes
+        indptr,indices: The CSR adjacency arrays; see toCSR
+        degrees: The degree of each node
+        edges: An array of the undirected edges (i,j), i<j, one row per edge
+            in lexicographic order. The row of an edge is its edge id
+        edgeIds: The edge id of each entry of indices
+    
+    The edge tables are computed the first time they are used
+    '''
+    def __init__(self,indptr,indices):
+        self.numNodes = len(indptr)-1
+        self.indptr = _readOnly(indptr)
+        self.degrees = _readOnly(np.diff(indptr))
+        keys = self._rows().astype(np.int64)*self.numNodes + indices
+        if np.any(keys[1:] <= keys[:-1]):
+            indices = indices[np.argsort(keys,kind='stable')]
+        self.indices = _readOnly(indices)
+        self._edges = None
+        self._edgeIds = None
+    
+    def neighbors(self,node):
+        '''
+        Returns the neighbors of node as a view of indices
+        '''
+        return self.indices[self.indptr[node]:self.indptr[node+1]]
+    
+    def incidentSlots(self,nodes):
+        '''
+        Returns arrays (u,slots) of every edge incident to the given nodes,
+        as a node u of nodes and the position in indices of its neighbor,
+        grouped by u
+        '''
+        nodes = np.asarray(nodes,dtype=np.int64)
+        counts = self.degrees[nodes]
+        u = np.repeat(nodes,counts)
+        #Position of each pair within the neighbors of its node u
+        offsets = np.arange(len(u)) - np.repeat(np.cumsum(counts)-counts,counts)
+        return u,self.indptr[u]+offsets
+    
+    def slotsOf(self,u,v):
+        '''
+        Returns the position in indices of each neighbor v[k] of u[k], or -1
+        where v[k] is not a neighbor of u[k], by binary search of the sorted
+        neighbor lists
+        '''
+        u = np.asarray(u,dtype=np.int64)
+        v = np.asarray(v,dtype=np.int64)
+        low = self.indptr[u].astype(np.int64)
+        high = self.indptr[u+1].astype(np.int64)
+        end = high.copy()
+        #Find the first slot in [low,high) whose neighbor is at least v
+        last = len(self.indices)-1
+        searching = low < high
+        while np.any(searching):
+            middle = (low+high)//2
+            below = self.indices[np.minimum(middle,last)] < v
+            low = np.where(searching & below,middle+1,low)
+            high = np.where(searching & ~below,middle,high)
+            searching = low < high
+        found = low < end
+        found[found] = self.indices[low[found]] == v[found]
+        return np.where(found,low,-1)
+    
+    def incidentEdges(self,nodes):
+        '''
+        Returns arrays (u,v) of every edge incident to the given nodes, as
+        ordered pairs from a node u of nodes to its neighbor v, grouped by u
+        '''
+        u,slots = self.incidentSlots(nodes)
+        return u,self.indices[slots]
+    
+    def _rows(self):
+        '''
+        Returns the node whose neighbor list holds each entry of indices
+        '''
+        return np.repeat(np.arange(self.numNodes,dtype=nodeIdDtype(self.numNodes)),
+                         self.degrees)
+    
+    def _computeEdges(self):
+        rows = self._rows()
+        low = np.minimum(rows,self.indices).astype(np.int64)
+        high = np.maximum(rows,self.indices).astype(np.int64)
+        upper = self.indices > rows
+        self._edges = _readOnly(np.column_stack([rows[upper],self.indices[upper]]))
+        #Sorted, as the neighbor lists are sorted
+        keys = low[upper]*self.numNodes + high[upper]
+        edgeIds = np.searchsorted(keys,low*self.numNodes+high)
+        self._edgeIds = _readOnly(edgeIds.astype(nodeIdDtype(len(keys))))
+    
+    @property
+    def edges(self):
+        if self._edges is None:
+            self._computeEdges()
+        return self._edges
+    
+    @property
+    def edgeIds(self):
+        if self._edgeIds is None:
+            self._computeEdges()
+        return self._edgeIds
+
+def _readOnly(array):
+    '''
+    Marks a NumPy array as read-only, unless it is a view of other memory
+    '''
+    if array.flags.owndata:
+        array.setflags(write=False)
+    return array
+
+#Compiled forms of the networkx graphs passed to compileGraph
+_compiledGraphs = weakref.WeakKeyDictionary()
+
+def compileGraph(G):
+    '''
+    Returns the CompiledGraph of G, compiling G with toCSR only the first
+    time it is passed. The result is cached on G (a CSRGraph or networkx
+    graph), so every simulation on G shares it. G must not be modified
+    afterwards
+    '''
+    if isinstance(G,CSRGraph):
+        if G._compiled is None:
+            G._compiled = CompiledGraph(G.indptr,G.indices)
+        return G._compiled
+    if not G in _compiledGraphs:
+        _compiledGraphs[G] = CompiledGraph(*toCSR(G))
+    return _compiledGraphs[G]
+
+def graphCSR(G):
+    '''
+    Returns the CSR adjacency arrays of G from its CompiledGraph; see
+    compileGraph
+    '''
+    compiled = compileGraph(G)
+    return compiled.indptr,compiled.indices
+
+def edgesToCSR(edges,numNodes):
+    '''
+    Converts an array of undirected edges (i,j), one row per edge, into CSR
+    adjacency arrays; see toCSR
+    '''
+    #Store each undirected edge in both directions
+    rows = np.concatenate([edges[:,0],edges[:,1]])
+    cols = np.concatenate([edges[:,1],edges[:,0]])
+    order = np.argsort(rows*numNodes+cols)
+    indices = cols[order].astype(nodeIdDtype(numNodes))
+    indptr = np.zeros(numNodes+1,dtype=np.int64)
+    np.cumsum(np.bincount(rows,minlength=numNodes),out=indptr[1:])
+    
+    return indptr,indices
+
+def fastRandomCSR(numNodes,prob=None,rng=None,connect='reject'):
+    '''
+    Generates a connected Erdos-Renyi G(n,p) random graph directly as CSR
+    adjacency arrays, without building a networkx graph
+    
+    Edges are sampled by geometric skipping over the n(n-1)/2 node pairs, so
+    the cost is proportional to the number of edges rather than of pairs,
+    and connectivity is checked with scipy.sparse.csgraph
+    
+    Parameters:
+        numNodes: The number of nodes, n, on G
+        prob (optional): The probability parameter p; ln(n)/n by default, as
+            in generateRandomGraph
+        rng (optional): A numpy random Generator
+        connect (optional): What to do if the sampled graph is disconnected:
+            'reject' samples a new graph, as generateRandomGraph does;
+            'giant' keeps only the largest connected component, relabelled
+            0,...,m-1; 'patch' adds one edge from a random node of each other
+            component to a random node of the largest component
+    
+    Returns:
+        indptr,indices: The CSR adjacency arrays
+    '''
+    if prob is None:
+        prob = log1p(numNodes)/numNodes
+    if rng is None:
+        rng = np.random.default_rng()
+    if not connect in ('reject','giant','patch'):
+        raise ValueError('connect must be one of reject, giant or patch')
+        
+    numPairs = numNodes*(numNodes-1)//2
+    #Linear index of the first pair (i,i+1) of each row i
+    rowStarts = np.arange(numNodes,dtype=np.int64)
+    rowStarts = rowStarts*(2*numNodes-rowStarts-1)//2
+    
+    while True:
+        positions = []
+        last = -1
+        batchSize = int(prob*numPairs*1.1)+100
+        while last < numPairs:
+            pairs = last + np.cumsum(rng.geometric(prob,batchSize))
+            positions.append(pairs[pairs < numPairs])
+            last = pairs[-1]
+        positions = np.concatenate(positions)
+        
+        i = np.searchsorted(rowStarts,positions,side='right')-1
+        j = positions - rowStarts[i] + i + 1
+        edges = np.column_stack([i,j])
+        indptr,indices = edgesToCSR(edges,numNodes)
+        
+        numComponents,labels = connected_components(
+            csr_matrix((np.ones(len(indices)),indices,indptr),
+                       shape=(numNodes,numNodes)),directed=False)
+        if numComponents == 1:
+            return indptr,indices
+        if connect == 'reject':
+            continue
         
+        giant = np.argmax(np.bincount(labels))
+        if connect == 'giant':
+            keep = labels == giant
+            newLabels = np.cumsum(keep)-1
+            edges = newLabels[edges[keep[edges[:,0]]]]
+            return edgesToCSR(edges,int(np.count_nonzero(keep)))
+        
+        #Connect a random node of each smaller component to the giant
+        order = rng.permutation(numNodes)
+        componentNodes = np.full(numComponents,-1,dtype=np.int64)
+        componentNodes[labels[order]] = order
+        others = np.delete(componentNodes,giant)
+        giantNodes = np.flatnonzero(labels == giant)
+        targets = giantNodes[rng.integers(len(giantNodes),size=len(others))]
+        edges = np.concatenate([edges,np.column_stack([others,targets])])
+        return edgesToCSR(edges,numNodes)
+
+def saveCSR(G,directory):
+    '''
+    Saves the CSR adjacency arrays of G to indptr.npy and indices.npy in
+    directory, so that they can be memory-mapped by loadCSR
+    '''
+    saveCSRArrays(*toCSR(G),directory)
+
+def saveCSRArrays(indptr,indices,directory):
+    '''
+    Saves CSR adjacency arrays to indptr.npy and indices.npy in directory
+    '''
+    np.save(os.path.join(directory,'indptr.npy'),indptr)
+    np.save(os.path.join(directory,'indices.npy'),indices)
+
+def loadCSR(directory,mmap=True):
+    '''
+    Loads CSR adjacency arrays saved by saveCSR. If mmap is True the arrays
+    are memory-mapped read-only rather than read into memory
+    '''
+    mode = 'r' if mmap else None
+    indptr = np.load(os.path.join(directory,'indptr.npy'),mmap_mode=mode)
+    indices = np.load(os.path.join(directory,'indices.npy'),mmap_mode=mode)
+    return indptr,indices
+
+class CSRGraph():
+    '''
+    An undirected contact network stored only as CSR adjacency arrays, for
+    networks too large to hold as a networkx graph. The arrays may be
+    memory-mapped, so the network need not fit in memory
+    
+    Nodes are the dense ids 0,...,n-1. If the network was built from other
+    node labels, labels[i] is the original label of node i; see ids
+    
+    CSRGraph implements the part of the networkx graph interface used by
+    SeirSim and the policies (nodes, edges, neighbors, degree and
+    number_of_edges), and toCSR and graphCSR return its arrays directly, so
+    it can be used anywhere a graph is expected. Build one with
+    fromEdgeList, fromSparse or loadCSRGraph
+    
+    Parameters:
+        indptr,indices: The CSR adjacency arrays, storing each edge in both
+            directions with sorted neighbors, as produced by edgesToCSR
+        labels (optional): The original label of each node, in sorted order
+        directory (optional): The directory the arrays were loaded from. If
+            given, only the directory is sent when the graph is pickled
+    '''
+    def __init__(self,indptr,indices,labels=None,directory=None):
+        self.indptr = indptr
+        self.indices = indices
+        self.labels = labels
+        self.directory = directory
+        self._compiled = None
+    
+    def __reduce__(self):
+        if self.directory is None:
+            return (CSRGraph,(self.indptr,self.indices,self.labels))
+        return (loadCSRGraph,(self.directory,))
+    
+    def __len__(self):
+        return len(self.indptr)-1
+    
+    def __iter__(self):
+        return iter(range(len(self)))
+    
+    def __contains__(self,node):
+        return 0 <= node < len(self)
+    
+    def nodes(self):
+        return range(len(self))
+    
+    def number_of_nodes(self):
+        return len(self)
+    
+    def number_of_edges(self):
+        return len(self.indices)//2
+    
+    def neighbors(self,node):
+        return self.indices[self.indptr[node]:self.indptr[node+1]]
+    
+    def degree(self,node=None):
+        '''
+        Returns the degree of node, or the degree of every node if node is
+        None
+        '''
+        if node is None:
+            return np.diff(self.indptr)
+        return int(self.indptr[node+1]-self.indptr[node])
+    
+    def edges(self,nbunch=None):
+        '''
+        Returns a list of the edges (u,v) incident to the nodes of nbunch (a
+        node or an iterable of nodes), or of every edge once with u<v if
+        nbunch is None
+        '''
+        if nbunch is None:
+            rows = np.repeat(np.arange(len(self)),np.diff(self.indptr))
+            upper = self.indices > rows
+            return list(zip(rows[upper].tolist(),self.indices[upper].tolist()))
+        if np.ndim(nbunch) == 0:
+            nbunch = [nbunch]
+        edges = []
+        for node in nbunch:
+            edges.extend((node,j) for j in self.neighbors(node).tolist())
+        return edges
+    
+    def ids(self,labels):
+        '''
+        Returns the dense ids of nodes given by their original labels
+        '''
+        if self.labels is None:
+            return np.asarray(labels)
+        ids = np.searchsorted(self.labels,labels)
+        if np.any(np.take(self.labels,ids,mode='clip') != labels):
+            raise KeyError('unknown node label')
+        return ids
+    
+    def save(self,directory):
+        '''
+        Saves the graph to directory, so that it can be loaded (and
+        memory-mapped) by loadCSRGraph
+        '''
+        saveCSRArrays(self.indptr,self.indices,directory)
+        if not self.labels is None:
+            np.save(os.path.join(directory,'labels.npy'),self.labels)
+
+def _edgesToGraph(edges,numNodes,labels=None):
+    '''
+    Builds a CSRGraph from an array of undirected edges between dense ids,
+    dropping self-loops and repeated edges
+    '''
+    edges = edges[edges[:,0] != edges[:,1]]
+    low = np.minimum(edges[:,0],edges[:,1]).astype(np.int64)
+    high = np.maximum(edges[:,0],edges[:,1]).astype(np.int64)
+    keys = np.unique(low*numNodes+high)
+    edges = np.column_stack([keys//max(numNodes,1),keys%max(numNodes,1)])
+    return CSRGraph(*edgesToCSR(edges,numNodes),labels=labels)
+
+def fromEdgeList(path,labelType=np.int64,delimiter=None,comments='#',
+                 chunkSize=1000000):
+    '''
+    Reads a CSRGraph from a text file with one edge per line, given by the
+    labels of its two endpoints (further columns, e.g. weights, are
+    ignored). The labels are remapped to dense ids 0,...,n-1 in sorted
+    order of label, unless they are already 0,...,n-1. Self-loops and
+    repeated edges are dropped
+    
+    The file is parsed chunkSize lines at a time, so only the edge arrays,
+    and never a networkx graph, are held in memory
+    
+    Parameters:
+        path: The edge list file
+        labelType (optional): The type of the node labels, e.g. str
+        delimiter (optional): The column delimiter; whitespace by default
+        comments (optional): The prefix of comment lines
+        chunkSize (optional): The number of lines parsed at a time
+    '''
+    chunks = []
+    with open(path) as f:
+        while True:
+            lines = list(islice(f,chunkSize))
+            if not lines:
+                break
+            chunks.append(np.loadtxt(lines,dtype=labelType,delimiter=delimiter,
+                                     comments=comments,usecols=(0,1),ndmin=2))
+    edges = np.concatenate(chunks) if chunks else np.zeros((0,2),dtype=labelType)
+    labels,edges = np.unique(edges,return_inverse=True)
+    edges = edges.reshape(-1,2)
+    if np.issubdtype(labels.dtype,np.integer) and \
+            np.array_equal(labels,np.arange(len(labels))):
+        return _edgesToGraph(edges,len(labels))
+    return _edgesToGraph(edges,len(labels),labels)
+
+def fromSparse(A,labels=None):
+    '''
+    Builds a CSRGraph from the nonzero pattern of a square scipy.sparse
+    matrix. Each nonzero A[i,j] with i != j is an undirected edge between
+    nodes i and j, so A may be symmetric or triangular
+    
+    Parameters:
+        A: A scipy.sparse matrix
+        labels (optional): The original label of each node, sorted
+    '''
+    A = coo_matrix(A)
+    if A.shape[0] != A.shape[1]:
+        raise ValueError('adjacency matrix must be square')
+    edges = np.column_stack([A.row,A.col])[A.data != 0]
+    return _edgesToGraph(edges,A.shape[0],
+                         None if labels is None else np.asarray(labels))
+
+#Live graphs loaded by loadCSRGraph in this process, keyed by directory.
+#Entries are dropped once nothing else refers to the graph
+_csrGraphs = weakref.WeakValueDictionary()
+
+def loadCSRGraph(directory,mmap=True):
+    '''
+    Returns the CSRGraph saved in directory by CSRGraph.save or saveCSR,
+    loading it unless this process already holds it. If mmap is True the
+    arrays are memory-mapped read-only
+    '''
+    G = _csrGraphs.get(directory)
+    if G is None:
+        labelPath = os.path.join(directory,'labels.npy')
+        labels = np.load(labelPath) if os.path.exists(labelPath) else None
+        G = CSRGraph(*loadCSR(directory,mmap=mmap),labels=labels,
+                     directory=directory)
+        _csrGraphs[directory] = G
     return G
 
+#Functions generateGraph(numNodes,prob,rng) returning CSR adjacency arrays,
+#by the name used in graph cache keys
+graphGenerators = {'gnp':lambda numNodes,prob,rng:
+                       toCSR(generateRandomGraph(numNodes,prob,rng=rng)),
+                   'fastgnp':fastRandomCSR}
+
+def graphCacheDir():
+    '''
+    Returns the default graph cache directory: $SEIRSIM_GRAPH_CACHE if set,
+    otherwise ~/.cache/seir-sim/graphs
+    '''
+    return os.environ.get('SEIRSIM_GRAPH_CACHE',
+                          os.path.join(os.path.expanduser('~'),'.cache',
+                                       'seir-sim','graphs'))
+
+def graphCachePath(numNodes,prob=None,seed=None,generator='gnp',cacheDir=None):
+    '''
+    Returns the cache directory of the random graph with the given
+    parameters. seed may be an int or a numpy SeedSequence
+    '''
+    if seed is None:
+        raise ValueError('random graphs can only be cached with a seed')
+    if prob is None:
+        prob = log1p(numNodes)/numNodes
+    if isinstance(seed,np.random.SeedSequence):
+        seed = (seed.entropy,seed.spawn_key)
+    key = repr((generator,int(numNodes),float(prob),seed))
+    digest = hashlib.sha1(key.encode()).hexdigest()
+    if cacheDir is None:
+        cacheDir = graphCacheDir()
+    return os.path.join(cacheDir,digest)
+
+def cachedRandomCSR(numNodes,prob=None,seed=None,generator='gnp',
+                    cacheDir=None,mmap=True):
+    '''
+    Returns the CSR adjacency arrays of the random graph generated by
+    graphGenerators[generator] with the given parameters, generating and
+    saving it to the cache only if it has not been saved before
+    
+    Graphs are written to a temporary directory which is renamed into place,
+    so concurrent processes never see a partially written graph; if two
+    processes generate the same graph, the first to finish is kept
+    
+    Parameters:
+        numNodes: The number of nodes, n, on G
+        prob (optional): The probability parameter p in the Erdos-Renyi
+            G(n,p) model; see generateRandomGraph
+        seed: An int or numpy SeedSequence seeding the generator
+        generator (optional): The name of the generator in graphGenerators
+        cacheDir (optional): The cache directory; graphCacheDir() by default
+        mmap (optional): Whether the arrays are memory-mapped read-only
+    
+    Returns:
+        indptr,indices: The CSR adjacency arrays
+    '''
+    directory = graphCachePath(numNodes,prob,seed,generator,cacheDir)
+    if not os.path.isdir(directory):
+        parent = os.path.dirname(directory)
+        os.makedirs(parent,exist_ok=True)
+        rng = np.random.default_rng(seed)
+        indptr,indices = graphGenerators[generator](numNodes,prob,rng)
+        tmp = tempfile.mkdtemp(dir=parent,prefix='.tmp-')
+        saveCSRArrays(indptr,indices,tmp)
+        try:
+            os.rename(tmp,directory)
+        except OSError:
+            #Another process saved the graph first
+            shutil.rmtree(tmp,ignore_errors=True)
+    return loadCSR(directory,mmap=mmap)
+
+def cachedRandomGraph(numNodes,prob=None,seed=None,generator='gnp',
+                      cacheDir=None):
+    '''
+    Returns the random graph with the given parameters as a CSRGraph over
+    the memory-mapped arrays of the graph cache; see cachedRandomCSR. The
+    graph is not kept by this module, so its memory is released as soon as
+    the caller drops it
+    '''
+    indptr,indices = cachedRandomCSR(numNodes,prob,seed,generator,cacheDir)
+    return CSRGraph(indptr,indices,
+                    directory=graphCachePath(numNodes,prob,seed,generator,cacheDir))
+
+def randomGraph(numNodes,prob=None,seed=None,cacheDir=None):
+    '''
+    Returns the connected G(n,p) random graph generated from seed
+    
+    Parameters:
+        numNodes: The number of nodes of the graph
+        prob (optional): The edge probability; see generateRandomGraph
+        seed (optional): A seed or SeedSequence for the graph
+        cacheDir (optional): A graph cache directory, e.g. graphCacheDir().
+            If given, the graph is loaded from the cache with
+            cachedRandomGraph, and only generated the first time it is used
+    '''
+    if cacheDir is None:
+        return generateRandomGraph(numNodes,prob,rng=np.random.default_rng(seed))
+    return cachedRandomGraph(numNodes,prob,seed=seed,cacheDir=cacheDir)
+
 def sampleF(F):
     '''
     Generate a random realization from the cumulative distribution function F
@@ -127,7 +687,7 @@ def sampleF(F):
         if (F[i,1] > x):
             return int(F[i,0])    
         
-def twoStepHeuristic(G,n1,n2):
+def twoStepHeuristic(G,n1,n2,rng=None):
     '''
     Use the two step heuristic algorithm described by K. Avrachenkov et al to
     search for the n nodes with highest degree.
@@ -139,56 +699,102 @@ def twoStepHeuristic(G,n1,n2):
         G: The graph to perform the heuristic search on
         n1: The number of nodes to sample from G for the 1st step
         n2: The culling parameter for the 2nd step of the TSH algorithm
+        rng (optional): A numpy random Generator used to sample nodes
     
     Returns:
         topNodes: A list of the top-k nodes of G as found by the TSH algorithm
     '''
-    nodes = G.nodes()
-    S = np.zeros([len(G.nodes())])
-    for i in range(n1):
-        v = choice(nodes)
-        for neighbor in G.neighbors(v):
-            S[neighbor] += 1
-    topNodes = np.argsort(S)[-n2:]
+    if rng is None:
+        rng = np.random.default_rng()
+    indptr,indices = graphCSR(G)
+    numNodes = len(indptr)-1
+    A = csr_matrix((np.ones(len(indices)),indices,indptr),
+                   shape=(numNodes,numNodes))
+    #Number of times each node was sampled
+    samples = np.bincount(rng.integers(numNodes,size=n1),minlength=numNodes)
+    #S[j] is the number of sampled nodes adjacent to j
+    S = A.dot(samples)
+    topNodes = np.argsort(S)[max(len(S)-n2,0):]
 
     return topNodes
 
-def acquaintanceN(G,n):
+def acquaintanceN(G,n,rng=None):
     '''
     Use the acquaintance algorithm to select n nodes to vaccinate. This process
     biases the selected nodes to be of higher degree. Based on
     paper by Cohen, Havlin and ben Avraham.
     
+    Each selection surveys a random node and selects a random one of its
+    neighbors which has not been selected yet; nodes with no such neighbors
+    are not surveyed again. Surveys are drawn in vectorized batches, with
+    neighbors rejection-sampled against a mask of selected nodes. A batch is
+    cut short at the first survey whose neighbor was selected earlier in
+    the same batch, and that survey is repeated with the same node, so the
+    selections have the same distribution as surveying one node at a time
+    
     Parameters:
         G: The graph to perform the heuristic search on
         n: The number of nodes to sample
+        rng (optional): A numpy random Generator used to sample nodes
     
     Returns:
-        topNodes: A list of nodes to vaccinate
+        topNodes: An array of nodes to vaccinate, in order of selection
     '''
-    nodes = G.nodes()
+    if rng is None:
+        rng = np.random.default_rng()
+    indptr,indices = graphCSR(G)
+    deg = np.diff(indptr)
+    
+    selected = np.zeros(len(deg),dtype=bool)
+    exhausted = np.zeros(len(deg),dtype=bool)
+    pool = np.flatnonzero(deg > 0)
     selectedNodes = []
+    #A surveyed node whose survey must be repeated
+    pending = None
     
-    def surveyNodeForNeighbor(nodes):
-        node = choice(nodes)
-        neighbors = G.neighbors(node)
-        neighbor = choice(neighbors)
-        neighbors.remove(neighbor)
+    while len(selectedNodes) < n:
+        pool = pool[~exhausted[pool]]
+        if len(pool) == 0:
+            raise ValueError('fewer than n nodes can be selected')
+        numSurveys = n - len(selectedNodes)
+        nodes = pool[rng.integers(len(pool),size=numSurveys)]
+        if not pending is None:
+            nodes[0] = pending
+            pending = None
         
-        while neighbor in selectedNodes and len(neighbors)>0:
-            neighbor = choice(neighbors)
-            neighbors.remove(neighbor)
+        #Rejection-sample an unselected neighbor of each surveyed node
+        neighbors = np.full(numSurveys,-1,dtype=np.int64)
+        todo = np.arange(numSurveys)
+        for attempt in range(32):
+            offsets = (rng.random(len(todo))*deg[nodes[todo]]).astype(np.int64)
+            candidates = indices[indptr[nodes[todo]]+offsets]
+            accepted = ~selected[candidates]
+            neighbors[todo[accepted]] = candidates[accepted]
+            todo = todo[~accepted]
+            if len(todo) == 0:
+                break
+        #Surveys which keep failing: choose among the unselected neighbors,
+        #if there are any
+        for survey in todo:
+            node = nodes[survey]
+            candidates = indices[indptr[node]:indptr[node+1]]
+            candidates = candidates[~selected[candidates]]
+            if len(candidates) > 0:
+                neighbors[survey] = candidates[rng.integers(len(candidates))]
         
-        if neighbor in selectedNodes:
-            nodes.remove(node)
-            return surveyNodeForNeighbor(nodes)
-        else:
-            return(neighbor)
+        #Stop at the first survey of an exhausted node, or whose neighbor
+        #was selected by an earlier survey of this batch
+        repeated = np.ones(numSurveys,dtype=bool)
+        repeated[np.unique(neighbors,return_index=True)[1]] = False
+        problems = np.flatnonzero(repeated | (neighbors < 0))
+        stop = problems[0] if len(problems) > 0 else numSurveys
         
-    for i in range(n):
-        nodeToVacc = surveyNodeForNeighbor(nodes)
-        selectedNodes.append(nodeToVacc)
+        selected[neighbors[:stop]] = True
+        selectedNodes.extend(neighbors[:stop].tolist())
+        if stop < numSurveys:
+            if neighbors[stop] < 0:
+                exhausted[nodes[stop]] = True
+            else:
+                pending = nodes[stop]
             
-    return selectedNodes
-        
-        
\ No newline at end of file
+    return np.array(selectedNodes,dtype=np.int64)
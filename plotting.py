@@ -7,9 +7,11 @@ Created on Thu Oct 11 22:33:24 2018
 import matplotlib.pyplot as plt
 from math import ceil
 
-def plotResults(axes,log,stats,title=None,legend=False):
+def plotResults(axes,log,stats,title=None,legend=False,times=None):
+    if times is None:
+        times = range(len(stats))
     for i in range(4):
-        axes.plot(range(len(log)),stats[:,i])
+        axes.plot(times,stats[:,i])
     if legend:
         axes.legend(['Susceptible','Exposed','Infected','Removed'],loc='upper right')
     plt.xlabel('t')
@@ -25,4 +27,4 @@ def plotExperiment(experiment,titles):
         axesList.append(f.add_subplot('{0}{1}{2}'.format(ceil(numSims/4),
                                       4,i)))
         plotResults(axesList[i],experiment.logs[i],experiment.stats[i],
-                    titles[i])
\ No newline at end of file
+                    titles[i],times=experiment.times[i])
\ No newline at end of file
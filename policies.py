@@ -5,59 +5,112 @@ Contains policies for use with seir-sim
 Policies are inputs to the simulation which affects its evolution
 """
 import numpy as np
-from random import choice
 from math import floor
+from collections import deque
 
 import networkalgs
+from triggers import AtTime,OnTransition
+from rankings import rankingIndex
 
 class Policy():
     '''
     An input to the simulation
     
+    Policies which change node states during a simulation must do so with
+    SeirSim.setNodeStates or SeirSim.removeNode, which keep the indexes,
+    state counts, tallies and triggers in step; the simulation does not
+    recount the states after a policy runs
+    
     Parameters:
         runOnInit: True if the policy is applied on simulation initialization;
             False by default
         runEachTimestep: True if the policy is applied on each timestep of the
             simulation; False by default
+        triggers (optional): A list of triggers (see triggers.py); the policy
+            is applied during the simulation whenever one of them fires
     '''
-    def __init__(self,runOnInit=False,runEachTimestep=False):
+    def __init__(self,runOnInit=False,runEachTimestep=False,triggers=None):
         self.runOnInit = runOnInit
         self.runEachTimestep = runEachTimestep
+        self.triggers = [] if triggers is None else triggers
         
     def execute(self,simulation):
         return
+        
+    def notify(self,simulation,node,oldState,newState):
+        '''
+        Called when a transition matches one of the policy's OnTransition
+        triggers, before the policy is executed
+        '''
+        return
     
-class vaccinateTopNDIL(Policy):
+class vaccinationPolicy(Policy):
         '''
-        Vaccinate the top N nodes ranked by the DIL metric as defined in
-        "Evaluating the importance of nodes in complex networks", Liu et al., 2016
+        Vaccinate N nodes chosen by selectNodes on simulation initialization
         
         Vaccinating a node changes its state from Susceptible to Removed
         
+        Subclasses implement selectNodes, which returns the nodes to vaccinate
+        in order of priority. The first k nodes selected for N are a valid
+        selection for k, so a single selection can be shared by every N up
+        to its size
+        
         Parameters:
-            N: The number of top nodes to vaccinate
+            N: The number of nodes to vaccinate
         '''
         def __init__(self,N):
             Policy.__init__(self,runOnInit=True,runEachTimestep=False)
             self.N = N
             
-        def execute(self,simulation):
-            nodeDIL = networkalgs.DIL(simulation.G)
+        def selectNodes(self,G,n,rng):
+            '''
+            Returns an array of n nodes of G to vaccinate, in order of priority.
+            The base policy selects none
+            '''
+            return np.zeros(0,dtype=np.int64)
             
-            for i in range(self.N):
-                topNode = np.argmax(nodeDIL)
-                nodeDIL[topNode] = 0
-                simulation.nodeStates[topNode] = 3
+        def execute(self,simulation):
+            nodes = np.asarray(self.selectNodes(simulation.G,self.N,simulation.rng))
                 
             '''
-            Ensure source node is not vaccinated. This ensures the simulation
-            can actually run, and is justified by the fact that giving a
-            vaccination to someone already infected by a disease does not cure
-            the disease
+            Only vaccinate susceptible nodes. This ensures the source node is
+            not vaccinated, so the simulation can actually run, and is
+            justified by the fact that giving a vaccination to someone already
+            exposed to or infected by a disease does not cure the disease. It
+            also lets the policy be applied to a branch of a simulation which
+            is already under way
             '''
-            simulation.nodeStates[simulation.sourceNode] = 2
+            nodes = nodes[simulation.nodeStates[nodes] == 0]
+            simulation.setNodeStates(nodes,3)
+
+class vaccinateNodes(vaccinationPolicy):
+        '''
+        Vaccinate a given list of nodes
+        
+        Parameters:
+            nodes: The nodes to vaccinate
+        '''
+        def __init__(self,nodes):
+            vaccinationPolicy.__init__(self,len(nodes))
+            self.nodes = np.asarray(nodes,dtype=np.int64)
+            
+        def selectNodes(self,G,n,rng):
+            return self.nodes[:n]
+    
+class vaccinateTopNDIL(vaccinationPolicy):
+        '''
+        Vaccinate the top N nodes ranked by the DIL metric as defined in
+        "Evaluating the importance of nodes in complex networks", Liu et al., 2016
+        
+        Vaccinating a node changes its state from Susceptible to Removed
+        
+        Parameters:
+            N: The number of top nodes to vaccinate
+        '''
+        def selectNodes(self,G,n,rng):
+            return rankingIndex(G).top('DIL',n)
                 
-class vaccinateTopNDegree(Policy):
+class vaccinateTopNDegree(vaccinationPolicy):
         '''
         Vaccinate the top N nodes ranked by degree
         
@@ -66,27 +119,10 @@ class vaccinateTopNDegree(Policy):
         Parameters:
             N: The number of top nodes to vaccinate
         '''
-        def __init__(self,N):
-            Policy.__init__(self,runOnInit=True,runEachTimestep=False)
-            self.N = N
-            
-        def execute(self,simulation):
-            nodeDeg = list(map(lambda x:simulation.G.degree(x),simulation.G.nodes()))
-            
-            for i in range(self.N):
-                topNode = np.argmax(nodeDeg)
-                nodeDeg[topNode] = 0
-                simulation.nodeStates[topNode] = 3
+        def selectNodes(self,G,n,rng):
+            return rankingIndex(G).top('degree',n)
                 
-            '''
-            Ensure source node is not vaccinated. This ensures the simulation
-            can actually run, and is justified by the fact that giving a
-            vaccination to someone already infected by a disease does not cure
-            the disease
-            '''
-            simulation.nodeStates[simulation.sourceNode] = 2
-                
-class vaccinateNRandom(Policy):
+class vaccinateNRandom(vaccinationPolicy):
         '''
         Vaccinate N nodes at random
         
@@ -95,54 +131,25 @@ class vaccinateNRandom(Policy):
         Parameters:
             N: The number of top nodes to vaccinate
         '''
-        def __init__(self,N):
-            Policy.__init__(self,runOnInit=True,runEachTimestep=False)
-            self.N = N
-            
-        def execute(self,simulation):
-            nodes = list(range(len(simulation.G.nodes())))
-            
-            for i in range(self.N):
-                node = choice(nodes)
-                simulation.nodeStates[node] = 3
-                nodes.remove(node)
+        def selectNodes(self,G,n,rng):
+            return rng.choice(len(G.nodes()),n,replace=False)
                 
-            '''
-            Ensure source node is not vaccinated. This ensures the simulation
-            can actually run, and is justified by the fact that giving a
-            vaccination to someone already infected by a disease does not cure
-            the disease
-            '''
-            simulation.nodeStates[simulation.sourceNode] = 2
-                
-class vaccinateTopNTSH(Policy):
+class vaccinateTopNTSH(vaccinationPolicy):
         '''
-        Vaccinate the top N nodes ranked by the Two Step Heuristic algorithm
+        Vaccinate the top N nodes ranked by the Two Step Heuristic algorithm,
+        sampling 2N nodes in the first step
         
         Vaccinating a node changes its state from Susceptible to Removed
         
         Parameters:
             N: The number of top nodes to vaccinate
         '''
-        def __init__(self,N):
-            Policy.__init__(self,runOnInit=True,runEachTimestep=False)
-            self.N = N
+        def selectNodes(self,G,n,rng):
+            topInd = networkalgs.twoStepHeuristic(G,n*2,n,rng=rng)
+            #twoStepHeuristic returns the top nodes in increasing order
+            return topInd[::-1]
             
-        def execute(self,simulation):
-            topInd = networkalgs.twoStepHeuristic(simulation.G,self.N*2,self.N)
- 
-            for node in topInd:
-                simulation.nodeStates[node] = 3
-                
-            '''
-            Ensure source node is not vaccinated. This ensures the simulation
-            can actually run, and is justified by the fact that giving a
-            vaccination to someone already infected by a disease does not cure
-            the disease
-            '''
-            simulation.nodeStates[simulation.sourceNode] = 2
-            
-class vaccinateNAcquaintance(Policy):
+class vaccinateNAcquaintance(vaccinationPolicy):
         '''
         Vaccinate N nodes chosen by the Acquaintance algorithm
         
@@ -151,20 +158,77 @@ class vaccinateNAcquaintance(Policy):
         Parameters:
             N: The number of top nodes to vaccinate
         '''
-        def __init__(self,N):
-            Policy.__init__(self,runOnInit=True,runEachTimestep=False)
-            self.N = N
-            
-        def execute(self,simulation):
-            topInd = networkalgs.acquaintanceN(simulation.G,self.N)
+        def selectNodes(self,G,n,rng):
+            return networkalgs.acquaintanceN(G,n,rng=rng)
+
+class ringVaccination(Policy):
+        '''
+        Reactive ring vaccination or contact tracing: when a node becomes
+        infectious and is detected, its neighbors (and optionally their
+        neighbors) are queued, and queued nodes are vaccinated or quarantined
+        subject to a daily capacity
+        
+        Vaccinating or quarantining a node changes its state to Removed.
+        Vaccination applies to Susceptible nodes, quarantine to Susceptible
+        and Exposed nodes. Each case costs O(degree) (O(degree^2) with
+        twoHop), using the simulation's compiled graph and SeirSim.removeNode
+        
+        Parameters:
+            capacity (optional): The most nodes vaccinated per day; unlimited
+                by default
+            twoHop (optional): Whether neighbors of neighbors are also queued
+            quarantine (optional): Whether Exposed nodes are also removed
+            detectionProb (optional): The probability that a newly infectious
+                node is detected
+            dayLength (optional): The length of a day in simulation time
+        '''
+        def __init__(self,capacity=None,twoHop=False,quarantine=False,
+                     detectionProb=1.,dayLength=1.):
+            triggers = [OnTransition(2)]
+            if not capacity is None:
+                #Work through the queue again at the start of each day
+                triggers.append(AtTime(dayLength,every=dayLength))
+            Policy.__init__(self,triggers=triggers)
+            self.capacity = capacity
+            self.twoHop = twoHop
+            self.targetStates = (0,1) if quarantine else (0,)
+            self.detectionProb = detectionProb
+            self.dayLength = dayLength
+            self.reset(None)
             
-            for node in topInd:
-                simulation.nodeStates[node] = 3
-                
+        def reset(self,simulation):
             '''
-            Ensure source node is not vaccinated. This ensures the simulation
-            can actually run, and is justified by the fact that giving a
-            vaccination to someone already infected by a disease does not cure
-            the disease
+            Clears the queue and capacity when the policy is used by a new
+            simulation
             '''
-            simulation.nodeStates[simulation.sourceNode] = 2
\ No newline at end of file
+            self.simulation = simulation
+            self.queue = deque()
+            self.day = None
+            self.usedToday = 0
+            
+        def notify(self,simulation,node,oldState,newState):
+            if not simulation is self.simulation:
+                self.reset(simulation)
+            if self.detectionProb < 1 and simulation.uniform() >= self.detectionProb:
+                return
+            graph = simulation.graph
+            ring = graph.neighbors(node)
+            if self.twoHop:
+                ring = np.concatenate([ring,graph.incidentEdges(ring)[1]])
+            states = simulation.nodeStates[ring]
+            ring = ring[np.isin(states,self.targetStates)]
+            self.queue.extend(ring.tolist())
+            
+        def execute(self,simulation):
+            if not simulation is self.simulation:
+                self.reset(simulation)
+            day = floor(simulation.t/self.dayLength)
+            if day != self.day:
+                self.day = day
+                self.usedToday = 0
+            while self.queue and (self.capacity is None or
+                                  self.usedToday < self.capacity):
+                node = self.queue.popleft()
+                if simulation.nodeStates[node] in self.targetStates:
+                    simulation.removeNode(node)
+                    self.usedToday += 1
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Contains node rankings for use with seir-sim
+
+A RankingIndex computes each ranking of a graph's nodes the first time it
+is requested and keeps it, so policies applied to many simulations on the
+same graph (e.g. by Experiment.compare or a K-sweep) rank its nodes once.
+rankingIndex(G) returns the index of a graph, holding the indices of at most
+maxGraphs recently used graphs
+"""
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+import networkalgs
+
+def degrees(G):
+    '''
+    Returns the degree of each node of G
+    '''
+    return np.diff(networkalgs.graphCSR(G)[0])
+
+#Functions score(G) returning an importance score for each node, by name
+scoreFunctions = {'degree':degrees,
+                  'DIL':networkalgs.DIL}
+
+class RankingIndex():
+    '''
+    Lazily computed and memoised node rankings of a graph
+
+    Parameters:
+        G: The graph whose nodes are ranked
+    '''
+    def __init__(self,G):
+        self._graph = weakref.ref(G)
+        self._scores = {}
+        self._rankings = {}
+
+    @property
+    def G(self):
+        return self._graph()
+
+    def scores(self,name):
+        '''
+        Returns the scores of the nodes under scoreFunctions[name]
+        '''
+        if not name in self._scores:
+            self._scores[name] = scoreFunctions[name](self.G)
+        return self._scores[name]
+
+    def ranking(self,name):
+        '''
+        Returns the nodes in decreasing order of score, ties broken by
+        node number
+        '''
+        if not name in self._rankings:
+            self._rankings[name] = np.argsort(-self.scores(name),kind='stable')
+        return self._rankings[name]
+
+    def top(self,name,n):
+        '''
+        Returns the n highest scoring nodes, in decreasing order of score
+        and in the same order as ranking(name)
+        
+        Unless the full ranking has already been computed, only the top n
+        nodes are sorted, found with a partition in O(N + n log n)
+        '''
+        if name in self._rankings:
+            return self._rankings[name][:n]
+        scores = self.scores(name)
+        if n >= len(scores):
+            return self.ranking(name)
+        if n <= 0:
+            return np.zeros(0,dtype=np.int64)
+        #Score of the n-th highest scoring node
+        threshold = -np.partition(-scores,n-1)[n-1]
+        above = np.flatnonzero(scores > threshold)
+        ties = np.flatnonzero(scores == threshold)[:n-len(above)]
+        nodes = np.concatenate([above,ties])
+        return nodes[np.lexsort((nodes,-scores[nodes]))]
+
+#The most recently used ranking indices, keyed by id of their graph
+_indices = OrderedDict()
+maxGraphs = 8
+
+def rankingIndex(G):
+    '''
+    Returns the RankingIndex of G, creating it if G is not one of the
+    maxGraphs most recently used graphs
+    '''
+    key = id(G)
+    index = _indices.get(key)
+    if index is None or not index.G is G:
+        index = RankingIndex(G)
+        _indices[key] = index
+    _indices.move_to_end(key)
+    while len(_indices) > maxGraphs:
+        _indices.popitem(last=False)
+    return index
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+Contains a runner for independent, reproducible replications of seir-sim
+experiments
+
+Each replicate is given its own numpy SeedSequence, spawned from a single
+root seed, which it uses for every random choice it makes (generating the
+contact network, choosing the source node, the policies and the simulation
+itself). Replicates can therefore be run on any number of processes, in any
+order, and still give the same results
+"""
+import os
+from multiprocessing import Pool
+
+import numpy as np
+from scipy.stats import norm
+
+from seirSim import SeirSim
+from networkalgs import randomGraph
+
+class ReplicationStats():
+    '''
+    Accumulates the running mean and variance of per-replicate summary
+    statistics without storing the individual replicates (Welford's method)
+
+    Summaries may be numbers or arrays of any fixed shape
+    '''
+    def __init__(self):
+        self.count = 0
+        self.mean = None
+        self._m2 = None
+
+    def add(self,summary):
+        '''
+        Adds the summary statistics of a single replicate
+        '''
+        summary = np.asarray(summary,dtype=float)
+        if self.count == 0:
+            self.mean = np.zeros(summary.shape)
+            self._m2 = np.zeros(summary.shape)
+        self.count += 1
+        delta = summary - self.mean
+        self.mean = self.mean + delta/self.count
+        self._m2 = self._m2 + delta*(summary-self.mean)
+
+    @property
+    def var(self):
+        '''
+        The sample variance (with ddof=1) of the summaries added so far
+        '''
+        return self._m2/(self.count-1)
+
+    def ciHalfwidth(self,level=.9):
+        '''
+        Returns the halfwidth of the two-sided normal confidence interval
+        for the mean at the given confidence level
+        '''
+        return norm.ppf((1+level)/2)*np.sqrt(self.var/self.count)
+
+class PolicyReplicate():
+    '''
+    A single replicate of a policy comparison: generates a random contact
+    network and runs a SeirSim with each set of policies on it. All of the
+    policy sets share the same simulation seed, so they are compared with
+    common random numbers
+
+    Parameters:
+        numNodes: The number of nodes of the random contact network
+        expRate: The rate of conversion from Susceptible to Exposed
+        infRate: The rate of conversion from Exposed to Infected
+        recRate: The rate of conversion from Infected to Removed/Recovered
+        policySets: A list where each entry is a list of policies to use for
+            a single simulation
+        summarize: A function summarize(simulation,logs,stats) returning the
+            summary statistics of a finished simulation
+        tallyFuncs (optional): Tally statistics passed to each simulation
+        prob (optional): The edge probability of the random network
+        graphCache (optional): A graph cache directory from which the random
+            networks are loaded; see networkalgs.randomGraph
+    '''
+    def __init__(self,numNodes,expRate,infRate,recRate,policySets,summarize,
+                 tallyFuncs=None,prob=None,graphCache=None):
+        self.numNodes = numNodes
+        self.expRate = expRate
+        self.infRate = infRate
+        self.recRate = recRate
+        self.policySets = policySets
+        self.summarize = summarize
+        self.tallyFuncs = tallyFuncs
+        self.prob = prob
+        self.graphCache = graphCache
+
+    def __call__(self,seedSequence):
+        '''
+        Runs the replicate, returning an array with the summary statistics
+        for each policy set
+        '''
+        graphSeed,simSeed = seedSequence.spawn(2)
+        G = randomGraph(self.numNodes,self.prob,seed=graphSeed,
+                        cacheDir=self.graphCache)
+        summaries = []
+        for policies in self.policySets:
+            sim = SeirSim(G,self.expRate,self.infRate,self.recRate,
+                          rngSeed=simSeed,
+                          tallyFuncs=self.tallyFuncs)
+            logs,stats = sim.simulate(policies)
+            summaries.append(self.summarize(sim,logs,stats))
+        return np.array(summaries)
+
+def _addSummaries(replicate,seeds,pool,aggregators):
+    '''
+    Runs a replicate for each seed, on pool if it is not None, and adds
+    each summary to every aggregator in replicate order
+    '''
+    summaries = map(replicate,seeds) if pool is None else pool.imap(replicate,seeds)
+    for summary in summaries:
+        for aggregator in aggregators:
+            aggregator.add(summary)
+
+def runReplications(replicate,numReplicates,seed=None,processes=None,
+                    aggregator=None):
+    '''
+    Runs independent replicates, each with its own SeedSequence spawned from
+    seed, and streams their summaries into an aggregator in replicate order
+
+    Parameters:
+        replicate: A picklable function replicate(seedSequence) returning the
+            summary statistics of one replicate, such as a PolicyReplicate
+        numReplicates: The number of replicates to run
+        seed (optional): The root seed; replicates are reproducible if given
+        processes (optional): The number of worker processes. Defaults to the
+            number of cores; 1 runs the replicates in this process
+        aggregator (optional): An object with an add(summary) method;
+            a new ReplicationStats by default
+
+    Returns:
+        aggregator: The aggregator after every replicate has been added
+    '''
+    if aggregator is None:
+        aggregator = ReplicationStats()
+    if processes is None:
+        processes = os.cpu_count()
+
+    seeds = np.random.SeedSequence(seed).spawn(numReplicates)
+
+    if processes == 1:
+        _addSummaries(replicate,seeds,None,[aggregator])
+    else:
+        with Pool(processes) as pool:
+            _addSummaries(replicate,seeds,pool,[aggregator])
+
+    return aggregator
+
+class PairedDifferences():
+    '''
+    Aggregator of the differences between policies within each replicate.
+    For a summary whose rows are policies, adds the matrix of differences
+    summary[i,column]-summary[j,column] to a ReplicationStats. A 1-D summary
+    is taken to have a single value per policy
+    '''
+    def __init__(self,column=0):
+        self.column = column
+        self.stats = ReplicationStats()
+
+    def add(self,summary):
+        values = np.asarray(summary,dtype=float)
+        if values.ndim > 1:
+            values = values[:,self.column]
+        self.stats.add(values[:,None]-values[None,:])
+
+def runUntilPrecise(replicate,halfwidth,column=0,paired=False,level=.9,
+                    batchSize=None,minReplicates=10,maxReplicates=1000,
+                    seed=None,processes=None):
+    '''
+    Runs replicates in batches until the confidence interval for every
+    policy's mean (or, if paired, for the difference between every pair of
+    policies) has a halfwidth below the target, or maxReplicates have been
+    run
+
+    The replicates are the same as those of runReplications with the same
+    seed, so stopping early gives a prefix of the fixed-size run
+
+    Parameters:
+        replicate: A picklable function replicate(seedSequence) returning a
+            summary whose rows are policies, such as a PolicyReplicate
+        halfwidth: The target confidence interval halfwidth
+        column (optional): The column of the summary the target applies to
+        paired (optional): Whether the target applies to the pairwise
+            differences between policies rather than to each policy
+        level (optional): The confidence level of the two-sided normal
+            intervals, computed with the sample variance; see ciHalfwidth
+        batchSize (optional): The number of replicates run between checks.
+            Defaults to the larger of 10 and the number of processes
+        minReplicates (optional): The number of replicates run before the
+            target is first checked
+        maxReplicates (optional): The most replicates that will be run
+        seed (optional): The root seed
+        processes (optional): The number of worker processes. Defaults to the
+            number of cores; 1 runs the replicates in this process
+
+    Returns:
+        stats: A ReplicationStats of the replicate summaries
+        differences: A ReplicationStats of the pairwise differences in the
+            given column
+    '''
+    if processes is None:
+        processes = os.cpu_count()
+    if batchSize is None:
+        batchSize = max(10,processes)
+
+    stats = ReplicationStats()
+    differences = PairedDifferences(column)
+    root = np.random.SeedSequence(seed)
+    pool = None if processes == 1 else Pool(processes)
+
+    def precise():
+        if stats.count < max(minReplicates,2):
+            return False
+        if paired:
+            widths = differences.stats.ciHalfwidth(level)
+            offDiagonal = ~np.eye(len(widths),dtype=bool)
+            return np.all(widths[offDiagonal] < halfwidth)
+        widths = stats.ciHalfwidth(level)
+        return np.all(np.atleast_2d(widths.T)[column] < halfwidth)
+
+    try:
+        while stats.count < maxReplicates and not precise():
+            numSeeds = min(batchSize,maxReplicates-stats.count)
+            _addSummaries(replicate,root.spawn(numSeeds),pool,
+                          [stats,differences])
+    finally:
+        if not pool is None:
+            pool.close()
+            pool.join()
+
+    return stats,differences.stats
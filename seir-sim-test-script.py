@@ -48,4 +48,17 @@ logList,statsList = exper.compare([[None],[randomVaccPolicy],
 titles = ['No Vaccination','Random Vaccination',
           'Degree-Ranked Vaccination','DIL-Ranked Vaccination',
           'TSH-Ranked Vaccination','Acquaintance Vaccination']
-plotExperiment(exper,titles)
\ No newline at end of file
+plotExperiment(exper,titles)
+
+#Intervene part way through an outbreak: vaccinating a branch of the
+#simulation must only remove susceptible nodes, leaving the exposed and
+#infectious nodes to run their course
+outbreak = SeirSim(G,exposureRate,infectionRate,recoveryRate,rngSeed=2018)
+for _ in zip(range(400),outbreak.simulateIter(yields='events')):
+    pass
+intervention = outbreak.branch()
+before = intervention.stateCounts.copy()
+vaccinateTopNDegree(numVaccinated).execute(intervention)
+after = intervention.stateCounts
+assert (after[1:3] == before[1:3]).all(), (before,after)
+assert after[0] + after[3] == before[0] + before[3]
@@ -6,86 +6,383 @@ Simulates dynamics of infectious diseases on a contact network using a
 discretized SEIR model
 """
 
-from random import random,choice
+import copy
+import pickle
+from math import log1p
 import numpy as np
 
+from indexedSet import IndexedSet,GraphEdgeSet
+from eventLog import EventLog
+from tallyFuncs import asTally
+from tallySchedule import TallyBuffer,TallySchedule
+from triggers import PolicyScheduler
+from networkalgs import nodeIdDtype,compileGraph
+
 class SeirSim():
     """
     Creates a simulation for the SEIR model for infectious disease
     
     Parameters:
-        G: The contact network used to run the simulation (networkX graph)
-        expRate(: The rate of conversion from Susceptible to Exposed
+        G: The contact network used to run the simulation (networkX graph
+            or CSRGraph). It is compiled to arrays once (see compileGraph),
+            and must not be modified afterwards
+        expRate: The rate of conversion from Susceptible to Exposed
         infRate: The rate of conversion from Exposed to Infected
         recRate: The rate of conversion from Infected to Removed/Recovered
-        tallyFuncs (optional): Functions to be used as tally statistics
-            during the simulation run
+        rngSeed (optional): Seed for the simulation's numpy random number
+            generator. May be an int or a numpy SeedSequence; copies of the
+            simulation use the same seed
+        tallyFuncs (optional): Functions f(simState) or Tally objects to be
+            used as tally statistics during the simulation run
+        tallySchedule (optional): A TallySchedule which decides when tally
+            statistics are recorded; every event by default
         logSim (optional): Whether or not to record the simulations results
+            in an EventLog
+        keyframeInterval (optional): The number of events between copies of
+            the node states stored in the EventLog
     """
     nodeStateDict = {0:'Susceptible',
                      1:'Exposed',
                      2:'Infectious',
                      3:'Recovered'}
     
+    __slots__ = ('G','graph','expRate','infRate','recRate','tallyFuncs',
+                 'tallySchedule','logSim','keyframeInterval','rngSeed',
+                 'nodeStates','exposedList','infectiousList','siList','rng',
+                 '_uniforms','_uniformIndex','sourceNode','t','numEvents',
+                 'scheduler','_events','_yieldedRows','simState',
+                 'stateCounts','simStates','useTally','tallies','schedule',
+                 'tallyBuffer','timeBuffer','policies')
+    
     def __init__(self,G,expRate,infRate,recRate,
                  rngSeed=None,
                  tallyFuncs=None,
-                 logSim=False):
+                 tallySchedule=None,
+                 logSim=False,
+                 keyframeInterval=1000):
         self.G = G
+        #Neighbor arrays shared by every simulation on G
+        self.graph = compileGraph(G)
         self.expRate = expRate
         self.infRate = infRate
         self.recRate = recRate
         self.tallyFuncs = tallyFuncs
+        self.tallySchedule = tallySchedule
         self.logSim = logSim
+        self.keyframeInterval = keyframeInterval
         self.rngSeed = rngSeed
         
-        self.nodeStates = np.zeros(len(G.nodes()))
+        #State codes are stored as int8
+        self.nodeStates = np.zeros(self.graph.numNodes,dtype=np.int8)
     
-        self.exposedList = []
+        #Exposed and infectious node pools, and the set of edges (i,j)
+        #between a susceptible node i and an infectious node j, stored in
+        #typed arrays
+        self.exposedList = IndexedSet(dtype=self.graph.indices.dtype)
     
-        self.infectiousList = []
-        self.siList = []
+        self.infectiousList = IndexedSet(dtype=self.graph.indices.dtype)
+        self.siList = GraphEdgeSet(self.graph)
                     
-        if not self.rngSeed is None:
-            random.seed(self.rngSeed)
+        self.rng = np.random.default_rng(rngSeed)
+        #Uniform random numbers are drawn from rng in blocks
+        self._uniforms = np.empty(0)
+        self._uniformIndex = 0
             
         #Mark a single node as infectious
         validSourceNodes = np.where(self.nodeStates==0)
-        sourceNode = choice(validSourceNodes[0])
+        sourceNode = self.choice(validSourceNodes[0])
         self.sourceNode = sourceNode
         
         self.nodeStates[sourceNode] = 2
-        self.infectiousList.append(sourceNode)
-        for edge in G.edges(sourceNode):
-            if self.nodeStates[edge[1]]==0:
-                self.siList.append(edge)
+        self.infectiousList.add(sourceNode)
+        self.addSusceptibleEdges(sourceNode)
         
-        #A list of simulation state arrays
-        if self.logSim:
-            self.simStates = []
-            self.simState = [self.nodeStates.copy(),self.siList.copy()]
-            self.simStates.append(self.simState)
-    
         self.t = 0
+        self.numEvents = 0
+        
+        #Runs policies with triggers; created by simulate
+        self.scheduler = None
+        
+        #Transitions not yet yielded by simulateIter, or None if they are
+        #not being collected
+        self._events = None
+        
+        #The live simulation state passed to tally functions
+        self.simState = [self.nodeStates,self.siList]
+        
+        #The number of nodes in each state
+        self.stateCounts = np.zeros(len(self.nodeStateDict),dtype=np.int64)
+        self.countStates()
+        
+        #A log of the state transitions of the simulation
+        self.simStates = None
+        if self.logSim:
+            self.simStates = EventLog(self.nodeStates,self.t,
+                                      keyframeInterval=keyframeInterval)
         
         self.useTally = not tallyFuncs is None
         
         if (self.useTally):
-            self.tallyStats = []
+            #Each simulation gets its own copy of any Tally objects
+            self.tallies = [copy.copy(asTally(f)) for f in tallyFuncs]
+            for tally in self.tallies:
+                tally.start(self)
+            schedule = TallySchedule() if tallySchedule is None else tallySchedule
+            self.schedule = copy.copy(schedule)
+            self.tallyBuffer = TallyBuffer(len(self.tallies))
+            self.timeBuffer = TallyBuffer(1)
             self.recordTallyStats()
     
     def __copy__(self):
-        return SeirSim(self.G,self.expRate,self.infRate,self.recRate,
+        return self.withGraph(self.G)
+    
+    def withGraph(self,G):
+        '''
+        Returns a new simulation on the contact network G with the same
+        parameters as this one
+        '''
+        return type(self)(G,self.expRate,self.infRate,self.recRate,
                  rngSeed=self.rngSeed,
                  tallyFuncs=self.tallyFuncs,
-                 logSim=self.logSim)
+                 tallySchedule=self.tallySchedule,
+                 logSim=self.logSim,
+                 keyframeInterval=self.keyframeInterval)
+    
+    def __getstate__(self):
+        #The compiled graph is rebuilt from G rather than pickled
+        return {name:getattr(self,name) for name in SeirSim.__slots__
+                if name != 'graph' and hasattr(self,name)}
+    
+    def __setstate__(self,state):
+        for name,value in state.items():
+            setattr(self,name,value)
+        self.graph = compileGraph(self.G)
+        self.siList.attachGraph(self.graph)
+    
+    def snapshot(self):
+        '''
+        Returns a SimSnapshot of the engine state, from which this or another
+        simulation of the same graph can continue exactly as this one would
+        '''
+        return SimSnapshot(self)
+    
+    def restore(self,snapshot):
+        '''
+        Sets the engine state to a SimSnapshot taken from a simulation of
+        the same graph. The event log and tallies are restarted from the
+        restored state, with a single tally row at the snapshot's time
+        '''
+        self.nodeStates[:] = snapshot.nodeStates
+        self.exposedList = IndexedSet(snapshot.exposed,
+                                      self.graph.indices.dtype)
+        self.infectiousList = IndexedSet(snapshot.infectious,
+                                         self.graph.indices.dtype)
+        self.siList = GraphEdgeSet(self.graph)
+        susceptible = snapshot.siEdges['susceptible']
+        infectious = snapshot.siEdges['infectious']
+        self.siList.addEdges(self.siList.edgeIdsOf(susceptible,infectious),
+                             susceptible,infectious)
+        self.simState[1] = self.siList
+        self.t = snapshot.t
+        self.numEvents = snapshot.numEvents
+        self.sourceNode = snapshot.sourceNode
+        self.rng.bit_generator.state = snapshot.rngState
+        self._uniforms = snapshot.uniforms.copy()
+        self._uniformIndex = 0
+        self.countStates()
+        if self.logSim:
+            self.simStates.reset(self.nodeStates,self.t)
+        if self.useTally:
+            for tally in self.tallies:
+                tally.start(self)
+            self.tallyBuffer.clear()
+            self.timeBuffer.clear()
+            self.recordTallyStats()
+    
+    def branch(self,snapshot=None,rngSeed=None):
+        '''
+        Returns a new simulation continuing from a snapshot (the current
+        state by default) which can be run with simulate, e.g. with different
+        policies. The shared prefix of the outbreak is not re-simulated
+        
+        Parameters:
+            snapshot (optional): The SimSnapshot to continue from
+            rngSeed (optional): If given, the continuation draws its random
+                numbers from a new generator with this seed rather than
+                continuing the snapshot's stream, so that branches differ
+        '''
+        if snapshot is None:
+            snapshot = self.snapshot()
+        sim = copy.copy(self)
+        sim.restore(snapshot)
+        if not rngSeed is None:
+            sim.rngSeed = rngSeed
+            sim.rng = np.random.default_rng(rngSeed)
+            sim._uniforms = np.empty(0)
+        return sim
+    
+    def memoryUsage(self):
+        '''
+        Reports the approximate memory used by the simulation's state,
+        excluding the graph itself
+        
+        Returns:
+            usage: A dict of the bytes used by each part of the state, their
+                total, and the total per node and per edge of the graph
+        '''
+        usage = {'nodeStates':self.nodeStates.nbytes,
+                 'exposedList':self.exposedList.nbytes,
+                 'infectiousList':self.infectiousList.nbytes,
+                 'siList':self.siList.nbytes,
+                 'simStates':0 if self.simStates is None else self.simStates.nbytes,
+                 'tallies':self.tallyBuffer.nbytes+self.timeBuffer.nbytes
+                     if self.useTally else 0}
+        usage['total'] = sum(usage.values())
+        usage['perNode'] = usage['total']/max(len(self.nodeStates),1)
+        usage['perEdge'] = usage['total']/max(len(self.graph.indices)//2,1)
+        return usage
+    
+    @property
+    def tallyStats(self):
+        '''
+        The recorded tally statistics, one row per recording
+        '''
+        return self.tallyBuffer.array()
+    
+    @property
+    def tallyTimes(self):
+        '''
+        The simulation time at which each row of tallyStats was recorded
+        '''
+        return self.timeBuffer.array()[:,0]
+    
+    def uniform(self):
+        '''
+        Returns a uniform random number on [0,1) from the simulation's
+        generator
+        '''
+        if self._uniformIndex == len(self._uniforms):
+            self._uniforms = self.rng.random(1024)
+            self._uniformIndex = 0
+        x = self._uniforms[self._uniformIndex]
+        self._uniformIndex += 1
+        return x
+    
+    def choice(self,seq):
+        '''
+        Returns a uniformly chosen element of the sequence seq
+        '''
+        return seq[int(self.uniform()*len(seq))]
+    
+    def setNodeState(self,node,state):
+        '''
+        Sets the state of node, recording the transition in the event log,
+        the state counts and any Tally objects
+        '''
+        oldState = int(self.nodeStates[node])
+        if self.logSim:
+            self.simStates.record(self.t,node,oldState,state)
+        self.nodeStates[node] = state
+        self.stateCounts[oldState] -= 1
+        self.stateCounts[state] += 1
+        if self.useTally:
+            for tally in self.tallies:
+                tally.update(node,oldState,state,self.t)
+        if not self.scheduler is None:
+            self.scheduler.transition(node,oldState,state)
+        if not self._events is None:
+            self._events.append((self.t,node,oldState,state))
+    
+    def removeNode(self,node):
+        '''
+        Moves a single node to the Removed state (e.g. vaccination or
+        quarantine), updating the node pools and SI edge set in O(degree)
+        '''
+        state = self.nodeStates[node]
+        if state == 1:
+            self.exposedList.remove(node)
+        elif state == 2:
+            self.infectiousList.remove(node)
+        self.siList.discardNode(node)
+        self.setNodeState(node,3)
+    
+    def setNodeStates(self,nodes,states):
+        '''
+        Sets the states of an array of nodes at once, then rebuilds the
+        exposed, infectious and SI indexes and the state counts. Each node
+        whose state changes is then passed to the Tally objects and triggers
+        as a transition, as with setNodeState. Use this rather than writing
+        to nodeStates directly, e.g. to vaccinate nodes
+        
+        Parameters:
+            nodes: An array of nodes
+            states: The new state of each node, or a single state for all
+        '''
+        nodes = np.asarray(nodes,dtype=np.int64)
+        states = np.broadcast_to(states,nodes.shape)
+        oldStates = self.nodeStates[nodes]
+        self.nodeStates[nodes] = states
+        self.rebuildIndex()
+        self.countStates()
+        for node,oldState,state in zip(nodes.tolist(),oldStates.tolist(),
+                                       states.tolist()):
+            if self.logSim:
+                self.simStates.record(self.t,node,oldState,state)
+            if not self._events is None:
+                self._events.append((self.t,node,oldState,state))
+            if oldState == state:
+                continue
+            if self.useTally:
+                for tally in self.tallies:
+                    tally.update(node,oldState,state,self.t)
+            if not self.scheduler is None:
+                self.scheduler.transition(node,oldState,state)
+    
+    def rebuildIndex(self):
+        '''
+        Rebuilds the exposed and infectious node pools and the SI edge set
+        from the node state array
+        '''
+        infectious = np.flatnonzero(self.nodeStates==2)
+        self.exposedList = IndexedSet(np.flatnonzero(self.nodeStates==1),
+                                      self.graph.indices.dtype)
+        self.infectiousList = IndexedSet(infectious,self.graph.indices.dtype)
+        
+        #Edges (j,i) from each infectious node j to a susceptible node i
+        j,slots = self.graph.incidentSlots(infectious)
+        i = self.graph.indices[slots]
+        susceptible = self.nodeStates[i]==0
+        self.siList = GraphEdgeSet(self.graph)
+        self.siList.addEdges(self.graph.edgeIds[slots[susceptible]],
+                             i[susceptible],j[susceptible])
+        self.simState = [self.nodeStates,self.siList]
+    
+    def addSusceptibleEdges(self,node):
+        '''
+        Adds the edges (j,node) from each susceptible neighbor j of the
+        infectious node to the SI edge set
+        '''
+        start,end = self.graph.indptr[node],self.graph.indptr[node+1]
+        neighbors = self.graph.indices[start:end]
+        susceptible = self.nodeStates[neighbors]==0
+        self.siList.addEdges(self.graph.edgeIds[start:end][susceptible],
+                             neighbors[susceptible],node)
+    
+    def countStates(self):
+        '''
+        Recomputes the state counts from the node state array. Needed after
+        the node states are changed directly rather than with setNodeStates
+        or removeNode
+        '''
+        self.stateCounts[:] = np.bincount(self.nodeStates,
+                                          minlength=len(self.stateCounts))
     
     def transitionSE(self):
         '''
         S->E algorithm
         '''
         #Choose random edge (i,j) between SI
-        edge = choice(self.siList)
+        edge = self.choice(self.siList)
         
         if (edge[0] in self.infectiousList):
             newExposedNode = edge[1]
@@ -93,61 +390,112 @@ class SeirSim():
             newExposedNode = edge[0]
         
         #Remove all edges from SI list which contain the newly exposed node
-        for edge in self.siList.copy():
-            if newExposedNode in edge:
-                self.siList.remove(edge)
+        self.siList.discardNode(newExposedNode)
         
         #Add new exposed node to exposed list, mark as exposed in state array
-        self.exposedList.append(newExposedNode)
-        self.nodeStates[newExposedNode] = 1
+        self.exposedList.add(newExposedNode)
+        self.setNodeState(newExposedNode,1)
         
     def transitionEI(self):
         '''
         E->I algorithm
         '''
         #Choose a random exposed node to become infectious
-        newInfectedNode = choice(self.exposedList)
+        newInfectedNode = self.choice(self.exposedList)
         
         #Remove node from exposed list and add to infected list
         self.exposedList.remove(newInfectedNode)
-        self.infectiousList.append(newInfectedNode)
+        self.infectiousList.add(newInfectedNode)
         
-        #Check each edge (i,j) of the newly infected node i
-        for edge in self.G.edges(newInfectedNode):
-                #If j is infected, remove the edge from SI list
-
-                if (self.nodeStates[edge[1]]==2):
-                    if ((edge[1],newInfectedNode) in self.siList):    
-                        self.siList.remove((edge[1],newInfectedNode))
-                #If j is susceptible, add the edge to the SI list
-                elif (self.nodeStates[edge[1]]==0):
-                    self.siList.append((edge[1],newInfectedNode))
+        #Add each edge (i,j) of the newly infected node i to a susceptible
+        #node j to the SI list. i was exposed, so it had no edges in the list
+        self.addSusceptibleEdges(newInfectedNode)
                     
-        self.nodeStates[newInfectedNode] = 2
+        self.setNodeState(newInfectedNode,2)
         
     def transitionIR(self):
         #I-R algorithm
         #Choose a random infectious node to remove
-        newRemovedNode = choice(self.infectiousList)
+        newRemovedNode = self.choice(self.infectiousList)
         #Remove newly removed node from infectious list, update state array
         self.infectiousList.remove(newRemovedNode)
-        self.nodeStates[newRemovedNode] = 3
+        self.setNodeState(newRemovedNode,3)
         #Remove edges (i,j) from SI list, where i is the newly removed node
-        for edge in self.siList.copy():
-            if newRemovedNode in edge:
-                self.siList.remove(edge)
+        self.siList.discardNode(newRemovedNode)
         
     def simulate(self,policies=None):
         '''
         Runs the SEIR simulation
         
         Returns:
-        simStates: An array which records the state of each node during
-            each time step of the simulation
+        simStates: An EventLog which records the state transitions of the
+            simulation, or None if logSim is False
         tallyResults: A 2D list containing the tally results
         '''
+        for _ in self.simulateIter(policies,yields=None):
+            pass
+        tallyStats = None
+        if self.useTally:
+            tallyStats = self.tallyStats
+        return self.simStates,tallyStats
+    
+    def simulateIter(self,policies=None,yields='events',keepTallies=True):
+        '''
+        Runs the SEIR simulation lazily, as a generator. The caller may stop
+        iterating at any point (e.g. once a stopping criterion is met), which
+        leaves the simulation in its state at that point
+        
+        Parameters:
+            policies (optional): The policies to use, as for simulate
+            yields (optional): 'events' to yield each state transition as a
+                tuple (t,node,oldState,newState), including those made by
+                policies; 'tallies' to yield each tally row as a tuple
+                (t,row) when the tally schedule records it; None to yield
+                nothing
+            keepTallies (optional): If False, tally rows are discarded once
+                yielded so memory use does not grow with the length of the
+                outbreak. tallyStats then only holds rows not yet yielded
+        '''
+        if yields == 'tallies' and not self.useTally:
+            raise ValueError('yields=\'tallies\' requires tallyFuncs')
+        if yields == 'events':
+            self._events = []
+        self._yieldedRows = 0
+        try:
+            for item in self._simulate(policies,yields,keepTallies):
+                yield item
+        finally:
+            self._events = None
+    
+    def _pending(self,yields,keepTallies):
+        '''
+        Returns the transitions or tally rows recorded since the last call
+        '''
+        if yields == 'events':
+            events = self._events
+            self._events = []
+            return events
+        if yields == 'tallies':
+            start = self._yieldedRows
+            rows = list(zip(self.tallyTimes[start:].tolist(),
+                            self.tallyStats[start:].copy()))
+            if keepTallies:
+                self._yieldedRows = len(self.tallyBuffer)
+            else:
+                self.tallyBuffer.clear()
+                self.timeBuffer.clear()
+                self._yieldedRows = 0
+            return rows
+        return ()
+    
+    def _simulate(self,policies,yields,keepTallies):
+        '''
+        The body of simulateIter, which yields after initialization, after
+        every event and on completion unless yields is None
+        '''
         #print('Beginning simulation...')
         self.policies = policies
+        self.scheduler = None
             
         #Execute any policies with runOnInit=True 
         if not self.policies is None:
@@ -155,11 +503,31 @@ class SeirSim():
                 if not policy is None and policy.runOnInit:
                     policy.execute(self)
         
+        #Start the log and tallies from the state produced by the initial
+        #policies
+        self.countStates()
+        if self.logSim:
+            self.simStates.reset(self.nodeStates,self.t)
+        if self.useTally:
+            for tally in self.tallies:
+                tally.start(self)
+            self.schedule.start(self)
+        
+        #Policies with triggers are run by the scheduler when they fire
+        triggered = [] if self.policies is None else [
+            policy for policy in self.policies
+            if not policy is None and policy.triggers]
+        if triggered:
+            self.scheduler = PolicyScheduler(self,triggered)
+            self.runTriggeredPolicies()
+        
+        if not yields is None:
+            for item in self._pending(yields,keepTallies):
+                yield item
+        
         #Simulation tick loop
         while (len(self.siList) + len(self.exposedList) + len(self.infectiousList) > 0):
         
-            self.t = self.t + 1 
-        
             #True if an exposure event is possible
             expPossible = 1 if len(self.siList) > 0 else 0
             #True if an recovery event is possible
@@ -175,7 +543,12 @@ class SeirSim():
             probSE = expPossible*self.expRate*len(self.siList)/probDenom
             probEI = infPossible*self.infRate*len(self.exposedList)/probDenom
             
-            x = random()
+            self.advanceTime(probDenom)
+            
+            if self.useTally:
+                self.schedule.beforeEvent(self)
+            
+            x = self.uniform()
     
             #Produce transition event
             if (x < probSE):
@@ -187,28 +560,121 @@ class SeirSim():
             elif (recPossible):
                 self.transitionIR()
             
-            self.simState = [self.nodeStates.copy(),self.siList.copy()]
+            self.numEvents = self.numEvents + 1
             
             if self.useTally:
-                self.recordTallyStats()
-                
-            if self.logSim:
-                self.simStates.append(self.simState)
+                self.schedule.afterEvent(self,self.numEvents)
             
             if not self.policies is None:
                 for policy in self.policies:
                     if not policy is None and policy.runEachTimestep:
                         policy.execute(self)
             
-        return self.simStates,np.array(self.tallyStats)
+            if not self.scheduler is None:
+                self.runTriggeredPolicies()
+            
+            if not yields is None:
+                for item in self._pending(yields,keepTallies):
+                    yield item
+            
+        if self.useTally:
+            self.schedule.finish(self,self.numEvents)
+            if not yields is None:
+                for item in self._pending(yields,keepTallies):
+                    yield item
 
+    def runTriggeredPolicies(self):
+        '''
+        Executes the policies whose triggers have fired
+        '''
+        self.scheduler.runPending()
+    
+    def advanceTime(self,totalRate):
+        '''
+        Advances the simulation clock by one event. Time is measured as the
+        number of events that have occurred
+        '''
+        self.t = self.t + 1
 
-    def recordTallyStats(self):
+    def recordTallyStats(self,t=None):
         '''
-        Helper method thats calls all tally functions passed to the simulation
+        Helper method thats records the value of all tallies passed to the
+        simulation, stamped with time t (the current time by default)
         '''
         tResults = []
-        for f in self.tallyFuncs:
-            tResults.append(f(self.simState))
-        self.tallyStats.append(tResults)
-        return self.tallyStats
\ No newline at end of file
+        for tally in self.tallies:
+            tResults.append(tally.value())
+        self.tallyBuffer.append(tResults)
+        self.timeBuffer.append(self.t if t is None else t)
+        return self.tallyStats
+
+class SimSnapshot():
+    '''
+    The state of a SeirSim engine at one point of a simulation: the node
+    states, the exposed and infectious pools and SI edge set (in their
+    sampling order), the time and event counters and the random number
+    generator. Policy state, such as a ringVaccination queue, is not
+    included
+    
+    Snapshots are picklable; see save and loadSnapshot. Node ids are
+    stored as int32 where possible, and the SI edges as a structured array
+    with fields susceptible and infectious
+    
+    Parameters:
+        simulation: The SeirSim to take the snapshot of
+    '''
+    __slots__ = ('nodeStates','exposed','infectious','siEdges','t',
+                 'numEvents','sourceNode','rngState','uniforms')
+    
+    def __init__(self,simulation):
+        idType = nodeIdDtype(len(simulation.nodeStates))
+        self.nodeStates = simulation.nodeStates.copy()
+        self.exposed = simulation.exposedList.array().astype(idType)
+        self.infectious = simulation.infectiousList.array().astype(idType)
+        susceptible,infectious = simulation.siList.pairs()
+        self.siEdges = np.empty(len(susceptible),
+                                dtype=[('susceptible',idType),
+                                       ('infectious',idType)])
+        self.siEdges['susceptible'] = susceptible
+        self.siEdges['infectious'] = infectious
+        self.t = simulation.t
+        self.numEvents = simulation.numEvents
+        self.sourceNode = simulation.sourceNode
+        self.rngState = simulation.rng.bit_generator.state
+        #The unused part of the block of uniform random numbers
+        self.uniforms = simulation._uniforms[simulation._uniformIndex:].copy()
+    
+    def save(self,path):
+        '''
+        Writes the snapshot to a file
+        '''
+        with open(path,'wb') as f:
+            pickle.dump(self,f,protocol=pickle.HIGHEST_PROTOCOL)
+
+def loadSnapshot(path):
+    '''
+    Reads a SimSnapshot written by SimSnapshot.save
+    '''
+    with open(path,'rb') as f:
+        return pickle.load(f)
+
+class ContinuousSeirSim(SeirSim):
+    """
+    Creates a continuous-time simulation for the SEIR model using the direct
+    (Gillespie) method
+    
+    Every S-I edge becomes exposed at rate expRate, every exposed node becomes
+    infectious at rate infRate and every infectious node is removed at rate
+    recRate. The time between events is exponentially distributed with the
+    total rate of all possible events, so self.t and tallyTimes are measured
+    in the same units as the rates rather than in events.
+    
+    Parameters are the same as for SeirSim
+    """
+    __slots__ = ()
+    
+    def advanceTime(self,totalRate):
+        '''
+        Advances the simulation clock by an exponential inter-event time
+        '''
+        self.t = self.t - log1p(-self.uniform())/totalRate
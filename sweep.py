@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Contains a sweep over the number of vaccinated nodes K for seir-sim
+
+For each random contact network, each vaccination policy selects nodes once
+for the largest K, and the vaccination set for every smaller K is a prefix
+of that selection. Every simulation on a network uses the same seed, so the
+results for different K and policies are compared with common random numbers
+"""
+import os
+from multiprocessing import Pool
+
+import numpy as np
+
+from seirSim import SeirSim
+from policies import vaccinateNodes
+from networkalgs import randomGraph
+
+class GraphSweep():
+    '''
+    Runs every (K, policy) pair of a sweep on a single random contact network
+
+    Parameters:
+        numNodes: The number of nodes of the random contact network
+        expRate: The rate of conversion from Susceptible to Exposed
+        infRate: The rate of conversion from Exposed to Infected
+        recRate: The rate of conversion from Infected to Removed/Recovered
+        policyClasses: vaccinationPolicy subclasses to compare
+        Ks: The numbers of nodes to vaccinate
+        summarize: A function summarize(simulation,logs,stats,K) returning
+            a list of summary statistics of a finished simulation
+        tallyFuncs (optional): Tally statistics passed to each simulation
+        prob (optional): The edge probability of the random network
+        graphCache (optional): A graph cache directory from which the random
+            networks are loaded; see networkalgs.randomGraph
+    '''
+    def __init__(self,numNodes,expRate,infRate,recRate,policyClasses,Ks,
+                 summarize,tallyFuncs=None,prob=None,graphCache=None):
+        self.numNodes = numNodes
+        self.expRate = expRate
+        self.infRate = infRate
+        self.recRate = recRate
+        self.policyClasses = policyClasses
+        self.Ks = Ks
+        self.summarize = summarize
+        self.tallyFuncs = tallyFuncs
+        self.prob = prob
+        self.graphCache = graphCache
+
+    def __call__(self,task):
+        '''
+        Runs the sweep on the network of the given (graph index,
+        SeedSequence) task, returning a list of rows (graph, K, policy,
+        *summary)
+        '''
+        graph,seedSequence = task
+        graphSeed,rankSeed,simSeed = seedSequence.spawn(3)
+        G = randomGraph(self.numNodes,self.prob,seed=graphSeed,
+                        cacheDir=self.graphCache)
+        maxK = max(self.Ks)
+        rows = []
+        for policyClass in self.policyClasses:
+            rng = np.random.default_rng(rankSeed)
+            selection = policyClass(maxK).selectNodes(G,maxK,rng)
+            for K in self.Ks:
+                sim = SeirSim(G,self.expRate,self.infRate,self.recRate,
+                              rngSeed=simSeed,
+                              tallyFuncs=self.tallyFuncs)
+                logs,stats = sim.simulate([vaccinateNodes(selection[:K])])
+                summary = self.summarize(sim,logs,stats,K)
+                rows.append((graph,K,policyClass.__name__)+tuple(summary))
+        return rows
+
+def sweepK(sweep,numGraphs,statNames,seed=None,processes=None):
+    '''
+    Runs a GraphSweep on numGraphs independent random networks, one network
+    per task on a pool of processes
+
+    Parameters:
+        sweep: The GraphSweep to run on each network
+        numGraphs: The number of random networks
+        statNames: The names of the values returned by sweep.summarize
+        seed (optional): The root seed; the sweep is reproducible if given
+        processes (optional): The number of worker processes. Defaults to the
+            number of cores; 1 runs the sweep in this process
+
+    Returns:
+        table: A numpy record array with one row per (graph, K, policy) and
+            columns graph, K, policy and statNames
+    '''
+    if processes is None:
+        processes = os.cpu_count()
+
+    seeds = np.random.SeedSequence(seed).spawn(numGraphs)
+    tasks = list(enumerate(seeds))
+
+    if processes == 1:
+        results = list(map(sweep,tasks))
+    else:
+        with Pool(processes) as pool:
+            results = pool.map(sweep,tasks)
+
+    rows = [row for graphRows in results for row in graphRows]
+    return np.rec.fromrecords(rows,names=['graph','K','policy']+list(statNames))
@@ -3,17 +3,73 @@ import numpy as np
 
 """
 Contains tally functions for computing statistics in seir-sim
+
+SeirSim accepts two kinds of tally statistic: plain functions f(simState),
+which are evaluated on the whole simulation state after every event, and
+Tally objects, which are notified of each state transition and can update
+their value incrementally
 """
-def numNodesInState(state):
+class Tally():
     '''
-    Decorator function for creating tally statistics for nodes in
-    a certain state
+    A tally statistic which is updated by the state transitions of a
+    simulation
     '''
-    def numNodesInState_(simState):
+    def start(self,simulation):
+        '''
+        Called with the simulation before the first event, and again when
+        it is restored from a snapshot
+        '''
+        self.simulation = simulation
+    
+    def update(self,node,oldState,newState,t):
+        '''
+        Called after node changes from oldState to newState at time t
         '''
-        Tally statistic which computes the number of nodes in state at time t
+        return
+    
+    def value(self):
+        '''
+        Returns the current value of the tally statistic
         '''
-        n = len(simState[0])
-        return np.sum(np.where(simState[0]==state,np.ones(n),np.zeros(n)))
+        return
+
+class SnapshotTally(Tally):
+    '''
+    Adapts a tally function f(simState) to the Tally interface by evaluating
+    it on the simulation state each time a value is requested
+    '''
+    def __init__(self,f):
+        self.f = f
+    
+    def value(self):
+        return self.f(self.simulation.simState)
+
+class StateCount(Tally):
+    '''
+    Tally statistic which computes the number of nodes in state at time t
+    from the compartment counts kept by the simulation
+    
+    It can also be called as a tally function f(simState), in which case the
+    count is computed from the node state array
+    '''
+    def __init__(self,state):
+        self.state = state
+    
+    def __call__(self,simState):
+        return np.count_nonzero(simState[0]==self.state)
     
-    return numNodesInState_
\ No newline at end of file
+    def value(self):
+        return self.simulation.stateCounts[self.state]
+
+def asTally(f):
+    '''
+    Returns f if it is a Tally, otherwise wraps the tally function f in a
+    SnapshotTally
+    '''
+    return f if isinstance(f,Tally) else SnapshotTally(f)
+
+def numNodesInState(state):
+    '''
+    Creates a tally statistic for the number of nodes in a certain state
+    '''
+    return StateCount(state)
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Contains tally recording schedules for use with seir-sim
+
+A schedule decides after which events SeirSim records a row of tally
+statistics. Recording on every event produces one row per event, which is
+rarely needed for long runs; the schedules below bound the size of the
+output and the cost of evaluating the tallies
+"""
+import numpy as np
+
+class TallyBuffer():
+    '''
+    A preallocated 2D NumPy array which doubles its capacity when full
+
+    Parameters:
+        numColumns: The number of values in each row
+        capacity (optional): The initial number of rows
+    '''
+    __slots__ = ('_data','_numRows')
+
+    def __init__(self,numColumns,capacity=1024):
+        self._data = np.zeros((capacity,numColumns))
+        self._numRows = 0
+
+    def __len__(self):
+        return self._numRows
+
+    def append(self,row):
+        if self._numRows == len(self._data):
+            data = np.zeros((2*len(self._data),self._data.shape[1]))
+            data[:self._numRows] = self._data
+            self._data = data
+        self._data[self._numRows] = row
+        self._numRows += 1
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+    def clear(self):
+        '''
+        Discards the rows that have been appended, keeping the capacity
+        '''
+        self._numRows = 0
+
+    def array(self):
+        '''
+        Returns a view of the rows that have been appended
+        '''
+        return self._data[:self._numRows]
+
+class TallySchedule():
+    '''
+    Records tally statistics after every event
+    '''
+    def start(self,simulation):
+        '''
+        Called before the first event of the simulation
+        '''
+        self.lastRecorded = 0
+
+    def beforeEvent(self,simulation):
+        '''
+        Called after the simulation clock has advanced to the time of the
+        next event, but before the event is applied
+        '''
+        return
+
+    def afterEvent(self,simulation,eventNum):
+        '''
+        Called after the eventNum-th event has been applied
+        '''
+        simulation.recordTallyStats()
+        self.lastRecorded = eventNum
+
+    def finish(self,simulation,eventNum):
+        '''
+        Called after the last event, so the final state is always recorded
+        '''
+        if self.lastRecorded != eventNum:
+            simulation.recordTallyStats()
+            self.lastRecorded = eventNum
+
+class EveryKEvents(TallySchedule):
+    '''
+    Records tally statistics after every k events
+
+    Parameters:
+        k: The number of events between recorded rows
+    '''
+    def __init__(self,k):
+        self.k = k
+
+    def afterEvent(self,simulation,eventNum):
+        if eventNum % self.k == 0:
+            TallySchedule.afterEvent(self,simulation,eventNum)
+
+class TimeGrid(TallySchedule):
+    '''
+    Records tally statistics on a fixed grid of times 0,dt,2dt,...
+
+    The row recorded at a grid time is the state of the simulation at that
+    time, i.e. the state after the last event at or before it
+
+    Parameters:
+        dt: The spacing of the time grid
+    '''
+    def __init__(self,dt):
+        self.dt = dt
+
+    def start(self,simulation):
+        TallySchedule.start(self,simulation)
+        self.nextTime = simulation.t + self.dt
+
+    def beforeEvent(self,simulation):
+        #Record the pre-event state at every grid time the clock has passed
+        eventTime = simulation.t
+        while self.nextTime < eventTime:
+            simulation.recordTallyStats(self.nextTime)
+            self.nextTime += self.dt
+
+    def afterEvent(self,simulation,eventNum):
+        return
+
+    def finish(self,simulation,eventNum):
+        simulation.recordTallyStats(self.nextTime)
+
+class ChangeThreshold(TallySchedule):
+    '''
+    Records tally statistics whenever the number of nodes in some state has
+    changed by at least threshold since the last recorded row
+
+    Parameters:
+        threshold: The change in a state count which triggers a recording
+    '''
+    def __init__(self,threshold):
+        self.threshold = threshold
+
+    def start(self,simulation):
+        TallySchedule.start(self,simulation)
+        self.lastCounts = simulation.stateCounts.copy()
+
+    def afterEvent(self,simulation,eventNum):
+        change = np.max(np.abs(simulation.stateCounts-self.lastCounts))
+        if change >= self.threshold:
+            TallySchedule.afterEvent(self,simulation,eventNum)
+            self.lastCounts = simulation.stateCounts.copy()
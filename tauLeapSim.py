@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+seir-sim
+
+Simulates dynamics of infectious diseases on a contact network using a
+synchronous (tau-leaping) SEIR model, where every node is advanced at once
+on each time step of length dt
+"""
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from networkalgs import graphCSR
+
+def adjacencyMatrix(G):
+    '''
+    Returns the adjacency matrix of G as a float32 scipy.sparse CSR matrix
+    '''
+    indptr,indices = graphCSR(G)
+    numNodes = len(indptr)-1
+    return csr_matrix((np.ones(len(indices),dtype=np.float32),indices,indptr),
+                      shape=(numNodes,numNodes))
+
+class TauLeapSim():
+    """
+    Creates a fixed time step simulation for the SEIR model for infectious
+    disease. The contact network is stored as a CSR adjacency matrix and
+    each step is computed with vectorized NumPy operations, which is much
+    faster than SeirSim on large networks at the cost of resolving events
+    only to within dt
+    
+    During a step of length dt, a susceptible node with k infectious
+    neighbors becomes exposed with probability 1-exp(-expRate*k*dt), an
+    exposed node becomes infectious with probability 1-exp(-infRate*dt) and
+    an infectious node is removed with probability 1-exp(-recRate*dt)
+    
+    Parameters:
+        G: The contact network used to run the simulation (networkX graph)
+        expRate: The rate of conversion from Susceptible to Exposed
+        infRate: The rate of conversion from Exposed to Infected
+        recRate: The rate of conversion from Infected to Removed/Recovered
+        dt (optional): The length of each time step. Smaller steps are more
+            accurate but slower; 1 by default
+        rngSeed (optional): Seed for the simulation's random number generator
+        tallyFuncs (optional): Functions to be used as tally statistics
+            during the simulation run
+        logSim (optional): Whether or not to record the simulations results
+    """
+    nodeStateDict = {0:'Susceptible',
+                     1:'Exposed',
+                     2:'Infectious',
+                     3:'Recovered'}
+    
+    def __init__(self,G,expRate,infRate,recRate,
+                 dt=1.0,
+                 rngSeed=None,
+                 tallyFuncs=None,
+                 logSim=False):
+        self.G = G
+        self.expRate = expRate
+        self.infRate = infRate
+        self.recRate = recRate
+        self.dt = dt
+        self.tallyFuncs = tallyFuncs
+        self.logSim = logSim
+        self.rngSeed = rngSeed
+        
+        self.rng = np.random.default_rng(rngSeed)
+        
+        self.adjacency = adjacencyMatrix(G)
+        numNodes = self.adjacency.shape[0]
+        
+        self.nodeStates = np.zeros(numNodes,dtype=np.int8)
+        
+        #Mark a single node as infectious
+        sourceNode = self.rng.integers(numNodes)
+        self.sourceNode = sourceNode
+        self.nodeStates[sourceNode] = 2
+        
+        self.simState = [self.nodeStates]
+        
+        #A list of simulation state arrays
+        if self.logSim:
+            self.simStates = [[self.nodeStates.copy()]]
+        
+        self.t = 0
+        
+        self.useTally = not tallyFuncs is None
+        
+        if (self.useTally):
+            self.tallyStats = []
+            self.tallyTimes = []
+            self.recordTallyStats()
+    
+    def __copy__(self):
+        return self.withGraph(self.G)
+    
+    def withGraph(self,G):
+        '''
+        Returns a new simulation on the contact network G with the same
+        parameters as this one
+        '''
+        return type(self)(G,self.expRate,self.infRate,self.recRate,
+                 dt=self.dt,
+                 rngSeed=self.rngSeed,
+                 tallyFuncs=self.tallyFuncs,
+                 logSim=self.logSim)
+    
+    def __getstate__(self):
+        #The adjacency matrix is rebuilt from G rather than pickled
+        state = self.__dict__.copy()
+        del state['adjacency']
+        return state
+    
+    def __setstate__(self,state):
+        self.__dict__.update(state)
+        self.adjacency = adjacencyMatrix(self.G)
+    
+    def setNodeStates(self,nodes,states):
+        '''
+        Sets the states of an array of nodes at once
+        '''
+        self.nodeStates[nodes] = states
+    
+    def step(self):
+        '''
+        Advances every node of the network by one time step
+        '''
+        states = self.nodeStates
+        susceptible = states==0
+        exposed = states==1
+        infectious = states==2
+        
+        #Number of infectious neighbors of each node
+        pressure = self.adjacency.dot(infectious.astype(np.float32))
+        
+        probSE = -np.expm1(-self.expRate*self.dt*pressure)
+        probEI = -np.expm1(-self.infRate*self.dt)
+        probIR = -np.expm1(-self.recRate*self.dt)
+        
+        x = self.rng.random(len(states))
+        
+        newExposed = susceptible & (x < probSE)
+        newInfectious = exposed & (x < probEI)
+        newRemoved = infectious & (x < probIR)
+        
+        states[newExposed] = 1
+        states[newInfectious] = 2
+        states[newRemoved] = 3
+        
+        self.t = self.t + self.dt
+        
+    def simulate(self,policies=None):
+        '''
+        Runs the SEIR simulation
+        
+        Returns:
+        simStates: An array which records the state of each node during
+            each time step of the simulation
+        tallyResults: A 2D list containing the tally results
+        '''
+        self.policies = policies
+            
+        #Execute any policies with runOnInit=True 
+        if not self.policies is None:
+            for policy in self.policies:
+                if not policy is None and policy.runOnInit:
+                    policy.execute(self)
+        
+        #Simulation time step loop
+        while np.any((self.nodeStates==1) | (self.nodeStates==2)):
+            
+            self.step()
+            
+            if self.useTally:
+                self.recordTallyStats()
+                
+            if self.logSim:
+                self.simStates.append([self.nodeStates.copy()])
+            
+            if not self.policies is None:
+                for policy in self.policies:
+                    if not policy is None and policy.runEachTimestep:
+                        policy.execute(self)
+        
+        simStates = self.simStates if self.logSim else None
+        tallyStats = np.array(self.tallyStats) if self.useTally else None
+        return simStates,tallyStats
+
+    def recordTallyStats(self):
+        '''
+        Helper method thats calls all tally functions passed to the simulation
+        '''
+        tResults = []
+        for f in self.tallyFuncs:
+            tResults.append(f(self.simState))
+        self.tallyStats.append(tResults)
+        self.tallyTimes.append(self.t)
+        return self.tallyStats
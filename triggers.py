@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Contains triggers for scheduling policies in seir-sim
+
+A policy with triggers is executed by the simulation only when one of its
+triggers fires, rather than after every event as with runEachTimestep.
+Time triggers are kept in a priority queue, count thresholds are checked
+only when a transition changes the count they watch, and transition
+triggers are looked up by the transition's new state. Policies triggered by
+an event are executed after the event has been applied
+"""
+import heapq
+
+import numpy as np
+
+class AtTime():
+    '''
+    Fires at the first event at or after the simulation time t, and then
+    every `every` time units after t if every is given
+
+    Parameters:
+        t: The simulation time at which the trigger fires
+        every (optional): The interval at which the trigger repeats
+    '''
+    def __init__(self,t,every=None):
+        self.t = t
+        self.every = every
+
+class CountThreshold():
+    '''
+    Fires when the number of nodes in state reaches count, i.e. whenever the
+    count changes from below count to at least count (or, if above is False,
+    from above count to at most count). Also fires at the start of the
+    simulation if the count has already reached the threshold
+
+    Parameters:
+        state: The node state whose count is watched
+        count: The threshold
+        above (optional): Whether the trigger fires on reaching the threshold
+            from below (True, the default) or from above
+    '''
+    def __init__(self,state,count,above=True):
+        self.state = state
+        self.count = count
+        self.above = above
+
+    def reached(self,stateCounts):
+        if self.above:
+            return stateCounts[self.state] >= self.count
+        return stateCounts[self.state] <= self.count
+
+class OnTransition():
+    '''
+    Fires whenever a node changes to toState, optionally only from fromState
+    and only for a given node. The policy's notify method is called with the
+    transition when it fires
+
+    Unless fromState is given, nodes already in toState when the simulation
+    starts (e.g. the source node) also fire the trigger once, as transitions
+    from oldState None
+
+    Parameters:
+        toState: The new state of the transition
+        fromState (optional): The old state of the transition
+        node (optional): The node making the transition
+    '''
+    def __init__(self,toState,fromState=None,node=None):
+        self.toState = toState
+        self.fromState = fromState
+        self.node = node
+
+    def matches(self,node,oldState,newState):
+        return ((self.fromState is None or self.fromState == oldState) and
+                (self.node is None or self.node == node))
+
+class PolicyScheduler():
+    '''
+    Runs the policies of a simulation when their triggers fire
+
+    Parameters:
+        simulation: The simulation the policies are applied to
+        policies: Policies with a non-empty triggers list
+    '''
+    def __init__(self,simulation,policies):
+        self.simulation = simulation
+        self._timeQueue = []
+        #Count thresholds and transition triggers, keyed by state
+        self._thresholds = {}
+        self._transitions = {}
+        self._pending = []
+
+        for policy in policies:
+            for trigger in policy.triggers:
+                if isinstance(trigger,AtTime):
+                    self._push(trigger.t,trigger,policy)
+                elif isinstance(trigger,CountThreshold):
+                    self._thresholds.setdefault(trigger.state,[]).append(
+                        [trigger,policy,False])
+                elif isinstance(trigger,OnTransition):
+                    self._transitions.setdefault(trigger.toState,[]).append(
+                        (trigger,policy))
+                else:
+                    raise TypeError('unknown trigger {0}'.format(trigger))
+
+        self._initialTransitions()
+        self.checkCounts()
+
+    def _initialTransitions(self):
+        '''
+        Fires the transition triggers matched by the nodes which were
+        already in their toState before the scheduler was created
+        '''
+        for toState,entries in self._transitions.items():
+            entries = [entry for entry in entries if entry[0].fromState is None]
+            if not entries:
+                continue
+            nodes = np.flatnonzero(self.simulation.nodeStates==toState).tolist()
+            for node in nodes:
+                for trigger,policy in entries:
+                    if trigger.matches(node,None,toState):
+                        policy.notify(self.simulation,node,None,toState)
+                        self._fire(policy)
+
+    def _push(self,t,trigger,policy):
+        heapq.heappush(self._timeQueue,(t,id(trigger),trigger,policy))
+
+    def _fire(self,policy):
+        if not policy in self._pending:
+            self._pending.append(policy)
+
+    def _checkState(self,state):
+        stateCounts = self.simulation.stateCounts
+        for entry in self._thresholds.get(state,()):
+            trigger,policy,wasReached = entry
+            reached = trigger.reached(stateCounts)
+            if reached and not wasReached:
+                self._fire(policy)
+            entry[2] = reached
+
+    def checkCounts(self):
+        '''
+        Checks every count threshold, e.g. after the node states have been
+        changed outside of a transition
+        '''
+        for state in self._thresholds:
+            self._checkState(state)
+
+    def transition(self,node,oldState,newState):
+        '''
+        Called by the simulation after node changes from oldState to newState
+        '''
+        if oldState in self._thresholds:
+            self._checkState(oldState)
+        if newState in self._thresholds:
+            self._checkState(newState)
+        for trigger,policy in self._transitions.get(newState,()):
+            if trigger.matches(node,oldState,newState):
+                policy.notify(self.simulation,node,oldState,newState)
+                self._fire(policy)
+
+    def runPending(self):
+        '''
+        Fires the time triggers which the simulation clock has reached, then
+        executes every policy whose triggers have fired, in order of firing
+        '''
+        t = self.simulation.t
+        while self._timeQueue and self._timeQueue[0][0] <= t:
+            triggerTime,key,trigger,policy = heapq.heappop(self._timeQueue)
+            self._fire(policy)
+            if not trigger.every is None:
+                self._push(triggerTime+trigger.every,trigger,policy)
+
+        if not self._pending:
+            return False
+        pending = self._pending
+        self._pending = []
+        for policy in pending:
+            policy.execute(self.simulation)
+        return True